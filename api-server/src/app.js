@@ -12,6 +12,7 @@ import adminRoutes from "./routes/admin.js";
 import mfaRoutes from "./routes/mfa.js";
 import cveRouter from "./routes/cve.js";
 import mapRouter from "./routes/map.js";
+import { readiness } from "./retrievalClient.js";
 
 // ----- App & Parsers -----
 const app = express();
@@ -62,6 +63,10 @@ app.use(limiter);
 
 // ----- Health -----
 app.get("/health", (_req, res) => res.json({ ok: true }));
+app.get("/health/retrieval", async (_req, res) => {
+  const st = await readiness();
+  res.status(st.ready ? 200 : 503).json(st);
+});
 
 // ----- Docs -----
 app.get("/api/docs", (_req, res) => {
@@ -79,11 +84,17 @@ app.get("/api/docs", (_req, res) => {
         query: {
           q: "string (required)",
           k: "int (default 5)",
+          source: "comma-separated list (optional filter)",
+          site: "comma-separated list (optional filter)",
+          category: "comma-separated list (optional filter)",
+          since: "ISO-8601 date/time or epoch seconds (optional filter)",
+          until: "ISO-8601 date/time or epoch seconds (optional filter)",
+          days: "int, only chunks from the last N days (optional filter)",
           mode: "snippets | openai (default snippets)"
         },
         headers: { Authorization: "Bearer <token>" },
         responses: {
-          snippets: { mode: "snippets", count: "number", results: [{ id: "string", source: "string", title: "string", snippet: "string" }] },
+          snippets: { mode: "snippets", count: "number", results: [{ id: "string", source: "string", title: "string", site: "string", category: "string", timestamp: "string", snippet: "string" }] },
           openai: { mode: "openai", answer: "string", used: [{ id: "string", source: "string", title: "string" }] }
         }
       }
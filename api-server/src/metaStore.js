@@ -0,0 +1,25 @@
+// api-server/src/metaStore.js
+// Reader for llm-reader's meta.store (see llm-reader/metastore.py for the layout):
+// JSON records back to back, a table of uint64 offsets, then count + "TIMETA01".
+import fs from "node:fs";
+
+const MAGIC = "TIMETA01";
+
+/** Every live chunk record; a legacy meta.json is parsed as before. */
+export function loadMetaItems(metaPath) {
+  const buf = fs.readFileSync(metaPath);
+  const footer = buf.length - 16;
+  // told apart by the footer, not the extension: build_index.py --meta x.json writes a store
+  if (footer < 0 || buf.toString("latin1", footer + 8) !== MAGIC) {
+    return JSON.parse(buf.toString("utf-8")).filter(Boolean);
+  }
+  const count = Number(buf.readBigUInt64LE(footer));
+  const table = footer - 8 * (count + 1);
+  const items = [];
+  for (let i = 0; i < count; i++) {
+    const start = Number(buf.readBigUInt64LE(table + 8 * i));
+    const end = Number(buf.readBigUInt64LE(table + 8 * (i + 1)));
+    if (end > start) items.push(JSON.parse(buf.toString("utf8", start, end)));
+  }
+  return items;
+}
@@ -0,0 +1,93 @@
+// api-server/src/retrievalClient.js
+// Client for llm-reader/retrieval_server.py, which keeps the model, index and
+// meta store loaded. Set RETRIEVAL_SOCKET to use a Unix socket instead of RETRIEVAL_URL.
+import http from "node:http";
+
+const RETRIEVAL_URL = new URL(process.env.RETRIEVAL_URL || "http://127.0.0.1:8765");
+const RETRIEVAL_SOCKET = process.env.RETRIEVAL_SOCKET || "";
+const TIMEOUT_MS = Number(process.env.RETRIEVAL_TIMEOUT_MS || 15000);
+
+const agent = new http.Agent({ keepAlive: true, maxSockets: 64 });
+
+function call(method, path, body) {
+  const data = body === undefined ? "" : JSON.stringify(body);
+  const target = RETRIEVAL_SOCKET
+    ? { socketPath: RETRIEVAL_SOCKET }
+    : { host: RETRIEVAL_URL.hostname, port: RETRIEVAL_URL.port || 80 };
+  return new Promise((resolve, reject) => {
+    const req = http.request(
+      {
+        ...target,
+        path,
+        method,
+        agent,
+        timeout: TIMEOUT_MS,
+        headers: { "Content-Type": "application/json", "Content-Length": Buffer.byteLength(data) },
+      },
+      (res) => {
+        let out = "";
+        res.setEncoding("utf8");
+        res.on("data", (d) => (out += d));
+        res.on("end", () => {
+          let json;
+          try {
+            json = JSON.parse(out || "{}");
+          } catch (e) {
+            return reject(new Error("Bad JSON from retrieval service: " + e.message));
+          }
+          resolve({ status: res.statusCode, body: json });
+        });
+      }
+    );
+    req.on("timeout", () => req.destroy(new Error(`retrieval service timed out after ${TIMEOUT_MS} ms`)));
+    req.on("error", (e) =>
+      reject(new Error(`retrieval service unavailable (${e.message}); start llm-reader/retrieval_server.py`))
+    );
+    req.end(data);
+  });
+}
+
+/**
+ * Top-k chunk records for a query, optionally restricted by filters
+ * ({ source, site, category, since, until, days }; see llm-reader/attrstore.py).
+ * A rejected filter throws an Error with status 400.
+ */
+export async function retrieve(q, k = 5, filters = undefined) {
+  const { status, body } = await call("POST", "/search", filters ? { q, k, filters } : { q, k });
+  if (status !== 200) {
+    const err = new Error(body.error || `retrieval service returned ${status}`);
+    err.status = status;
+    throw err;
+  }
+  return body.items || [];
+}
+
+/** Filters from query-string params: ?category=government,vendor&days=7 (lists are comma-separated). */
+export function filtersFromQuery(query) {
+  const filters = {};
+  for (const key of ["source", "site", "category"]) {
+    if (query[key]) filters[key] = String(query[key]).split(",").map((v) => v.trim()).filter(Boolean);
+  }
+  for (const key of ["since", "until"]) {
+    if (query[key]) {
+      const n = Number(query[key]);
+      filters[key] = /^\d+$/.test(query[key]) && Number.isSafeInteger(n) ? n : String(query[key]);
+    }
+  }
+  if (query.days) {
+    // NaN would go out as null and be ignored; the raw string gets the server's 400 instead
+    const days = Number(query.days);
+    filters.days = Number.isFinite(days) ? days : String(query.days);
+  }
+  return Object.keys(filters).length ? filters : undefined;
+}
+
+/** { ready, ... } from /readyz; ready is false when the service cannot be reached. */
+export async function readiness() {
+  try {
+    const { body } = await call("GET", "/readyz");
+    return body;
+  } catch (e) {
+    return { ready: false, error: String(e.message || e) };
+  }
+}
@@ -1,19 +1,18 @@
 import { Router } from "express";
-import fs from "node:fs";
 import path from "node:path";
 import { requireAuth } from "../requireAuth.js";
+import { loadMetaItems } from "../metaStore.js";
 
 const router = Router();
 
-// Path to your meta.json file
-const META_PATH = process.env.META_PATH || path.join(process.cwd(), "../llm-reader/data/meta.json");
+// Path to the index builder's meta store (a legacy meta.json still works)
+const META_PATH = process.env.META_PATH || path.join(process.cwd(), "../llm-reader/data/meta.store");
 
 let META = [];
 function loadMeta() {
   try {
-    const raw = fs.readFileSync(META_PATH, "utf-8");
-    META = JSON.parse(raw);
-    console.log(`[stats] Loaded ${META.length} items from meta.json`);
+    META = loadMetaItems(META_PATH);
+    console.log(`[stats] Loaded ${META.length} items from ${path.basename(META_PATH)}`);
   } catch (e) {
     console.error("[stats] Failed to read META_PATH:", META_PATH, e);
     META = [];
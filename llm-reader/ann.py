@@ -0,0 +1,193 @@
+"""FAISS index types for the builder, and their query-time knobs.
+
+  flat     exact inner-product scan (IDMap2,Flat); best for small corpora
+  hnsw     graph search (IDMap2,HNSW32,Flat); fast, ~1.1x flat memory, no deletes
+  ivfflat  inverted lists over k-means cells (IVF<nlist>,Flat); supports deletes
+  ivfpq    IVF with product-quantized codes (IVF<nlist>,PQ<m>); a fraction of flat memory
+
+Ids are always meta store record numbers. The query-time defaults (NPROBE, EF_SEARCH)
+are stored in the index file; FAISS_NPROBE / FAISS_EF_SEARCH override them when
+the index is loaded through tune().
+"""
+import os, json, math, hashlib, threading
+
+import numpy as np
+import faiss
+
+TYPES = ("flat", "hnsw", "ivfflat", "ivfpq")
+NPROBE = 16       # IVF cells scanned per query
+EF_SEARCH = 64    # HNSW candidate list size per query
+HNSW_M = 32       # HNSW graph degree
+TRAIN_PER_LIST = 64  # k-means training points per IVF cell (FAISS wants 39-256)
+
+def manifest_path(index_path: str) -> str:
+    return os.path.splitext(index_path)[0] + ".manifest.json"
+
+def load_manifest(index_path: str) -> dict | None:
+    """What build_index.py recorded about the index: embedder, model, dim, type."""
+    try:
+        with open(manifest_path(index_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def content_version(*paths: str) -> str:
+    """Hash of the built files; the manifest records it as the index version."""
+    h = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()[:16]
+
+def index_version(index_path: str) -> str:
+    """What query caches are keyed on: the manifest version, else the index file's size and mtime."""
+    m = load_manifest(index_path)
+    if m and m.get("version"):
+        return m["version"]
+    st = os.stat(index_path)
+    return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+def choose_type(n: int) -> str:
+    """Index type for a corpus of n vectors."""
+    if n < 20_000:
+        return "flat"      # a full scan is well under a millisecond
+    if n < 1_000_000:
+        return "hnsw"
+    if n < 5_000_000:
+        return "ivfflat"
+    return "ivfpq"
+
+def nlist_for(n: int) -> int:
+    return max(1, min(65536, int(4 * math.sqrt(n)), n // TRAIN_PER_LIST or 1))
+
+def pq_m_for(d: int) -> int:
+    """Largest sub-quantizer count that divides d and keeps >= 4 dims per code."""
+    for m in (96, 64, 48, 32, 24, 16, 8, 4):
+        if d % m == 0 and d // m >= 4:
+            return m
+    return 1
+
+def factory_string(kind: str, d: int, n: int) -> str:
+    if kind == "flat":
+        return "IDMap2,Flat"
+    if kind == "hnsw":
+        return f"IDMap2,HNSW{HNSW_M},Flat"
+    if kind == "ivfflat":
+        return f"IVF{nlist_for(n)},Flat"
+    if kind == "ivfpq":
+        return f"IVF{nlist_for(n)},PQ{pq_m_for(d)}np"  # np: skip polysemous training, unused here
+    raise ValueError(f"unknown index type {kind!r}; choose from {', '.join(TYPES)}")
+
+def kind_of(index) -> str:
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivfflat"
+    return "flat"
+
+def vectors(index) -> tuple[np.ndarray, np.ndarray]:
+    """(X, ids) of everything in index; IVF-PQ gives back the quantized vectors."""
+    if isinstance(index, faiss.IndexIDMap):
+        inner = faiss.downcast_index(index.index)
+        return inner.reconstruct_n(0, inner.ntotal), faiss.vector_to_array(index.id_map).astype(np.int64)
+    ivf = faiss.extract_index_ivf(index)
+    lists = ivf.invlists
+    ids = np.concatenate([faiss.rev_swig_ptr(lists.get_ids(l), lists.list_size(l)).copy()
+                          for l in range(ivf.nlist) if lists.list_size(l)] or [np.zeros(0, np.int64)])
+    ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+    X = ivf.reconstruct_batch(ids) if len(ids) else np.zeros((0, ivf.d), np.float32)
+    ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+    return X, ids
+
+def make_index(kind: str, X: np.ndarray, ids: np.ndarray, seed: int = 698):
+    """A kind index over X (normalized rows) with the given ids."""
+    n, d = X.shape
+    index = faiss.index_factory(d, factory_string(kind, d, n), faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        n_train = min(n, nlist_for(n) * TRAIN_PER_LIST, 256 * 256 if kind == "ivfpq" else n)
+        sample = X if n_train == n else X[np.random.default_rng(seed).choice(n, n_train, replace=False)]
+        index.train(sample)
+    for i in range(0, n, 65536):
+        index.add_with_ids(X[i:i + 65536], ids[i:i + 65536])
+    set_params(index, NPROBE, EF_SEARCH)  # saved with the index
+    return index
+
+def set_params(index, nprobe: int | None = None, ef_search: int | None = None):
+    kind = kind_of(index)
+    ps = faiss.ParameterSpace()
+    if kind.startswith("ivf") and nprobe:
+        ps.set_index_parameter(index, "nprobe", nprobe)
+    elif kind == "hnsw" and ef_search:
+        ps.set_index_parameter(index, "efSearch", ef_search)
+    return index
+
+def tune(index):
+    """Apply FAISS_NPROBE / FAISS_EF_SEARCH, if set, to a loaded index."""
+    return set_params(index, int(os.getenv("FAISS_NPROBE", 0)), int(os.getenv("FAISS_EF_SEARCH", 0)))
+
+def search_params(index, sel):
+    """SearchParameters carrying sel plus the index's own nprobe / efSearch (params replace them)."""
+    kind = kind_of(index)
+    if kind.startswith("ivf"):
+        return faiss.SearchParametersIVF(sel=sel, nprobe=faiss.extract_index_ivf(index).nprobe)
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=faiss.downcast_index(index.index).hnsw.efSearch)
+    return faiss.SearchParameters(sel=sel)
+
+class FilteredSearch:
+    """index.search restricted to the ids where allow (a bool per id) is True.
+
+    The allowed ids go to FAISS as an ID selector, so filtered-out vectors are
+    never scored and k is not inflated. Flat just skips them. IVF would find
+    fewer allowed ids in its nprobe cells, so nprobe grows with the share of
+    ids filtered out (checking an id costs far less than scoring it). HNSW
+    walks its graph through filtered-out nodes, so efSearch grows the same way,
+    and below PARTITION_MAX ids the allowed vectors are searched exactly in a
+    flat sub-index instead, kept for the next query with the same filter.
+    """
+    PARTITION_MAX = 20_000
+    PARTITIONS = 16  # sub-indexes kept, least recently used dropped first
+
+    def __init__(self, index):
+        self.index = index
+        self.kind = kind_of(index)
+        self.partitions = {}  # filter key -> IDMap2,Flat over the allowed vectors
+        self.lock = threading.Lock()
+
+    def search(self, X: np.ndarray, k: int, allow: np.ndarray, key=None) -> tuple[np.ndarray, np.ndarray]:
+        n = int(np.count_nonzero(allow))
+        if n == 0:
+            return np.full((len(X), k), -np.inf, np.float32), np.full((len(X), k), -1, np.int64)
+        if self.kind == "hnsw" and n <= self.PARTITION_MAX:
+            return self.partition(allow, key).search(X, k)
+        bitmap = np.packbits(allow, bitorder="little")  # must outlive the search
+        params = search_params(self.index, faiss.IDSelectorBitmap(len(allow), faiss.swig_ptr(bitmap)))
+        widen = len(allow) / n
+        if self.kind == "hnsw":
+            params.efSearch = min(1024, int(params.efSearch * widen))
+        elif self.kind.startswith("ivf"):
+            params.nprobe = min(faiss.extract_index_ivf(self.index).nlist, math.ceil(params.nprobe * widen))
+        return self.index.search(X, k, params=params)
+
+    def partition(self, allow: np.ndarray, key=None):
+        with self.lock:
+            part = self.partitions.pop(key, None) if key is not None else None
+            if part is None:
+                ids = np.flatnonzero(allow).astype(np.int64)
+                part = faiss.IndexIDMap2(faiss.IndexFlatIP(self.index.d))
+                part.add_with_ids(self.index.reconstruct_batch(ids), ids)
+            if key is not None:
+                self.partitions[key] = part
+                while len(self.partitions) > self.PARTITIONS:
+                    self.partitions.pop(next(iter(self.partitions)))
+            return part
+
+def supports_remove(index) -> bool:
+    return kind_of(index) != "hnsw"
+
+def memory_bytes(index) -> int:
+    return faiss.serialize_index(index).nbytes
@@ -1,27 +1,124 @@
 # ask_fast.py
-import os, json, numpy as np, faiss
-from fastembed import TextEmbedding
+import os, numpy as np, faiss
 
-META_PATH  = "data/meta.json"
-INDEX_PATH = "data/index.faiss"
+import ann
+import attrstore
+import bm25
+import metastore
+import query_cache
+from embedders import get_embedder
+
+META_PATH  = os.getenv("META_PATH", "data/meta.store")
+INDEX_PATH = os.getenv("INDEX_PATH", "data/index.faiss")
 MODEL_NAME = "BAAI/bge-small-en-v1.5"
+QUERY_CACHE = os.getenv("QUERY_CACHE", "1") != "0"
+HYBRID = os.getenv("HYBRID", "1") != "0"
+FUSE_DEPTH = 50  # candidates taken from each of the dense and BM25 rankings before fusing
+
+CACHE = None     # query_cache.QueryCache for the loaded index, set by load()
+LEXICAL = None   # bm25.BM25Index next to the loaded index, if it was built with one
+ATTRS = None     # attrstore.AttrStore next to the loaded index, if it was built with one
+FILTERED = None  # ann.FilteredSearch over the loaded index
 
-def load():
-    meta = json.load(open(META_PATH, "r", encoding="utf-8"))
-    index = faiss.read_index(INDEX_PATH)
-    model = TextEmbedding(model_name=MODEL_NAME)
+def load(cache: bool = QUERY_CACHE):
+    global CACHE, LEXICAL, ATTRS, FILTERED
+    meta = metastore.open_meta(META_PATH)  # mmap; only the records retrieved are parsed
+    index = ann.tune(faiss.read_index(INDEX_PATH))  # FAISS_NPROBE / FAISS_EF_SEARCH
+    lexical_path = bm25.bm25_path(INDEX_PATH)
+    LEXICAL = bm25.BM25Index(lexical_path) if HYBRID and os.path.exists(lexical_path) else None
+    attrs_path = attrstore.attrs_path(INDEX_PATH)
+    ATTRS = attrstore.AttrStore(attrs_path) if os.path.exists(attrs_path) else None
+    FILTERED = ann.FilteredSearch(index)
+    model = query_model(index)
+    CACHE = None
+    if cache:
+        # a bare fastembed TextEmbedding keeps its runtime object in .model, not the name
+        model_name = getattr(model, "model", None)
+        name = f"{getattr(model, 'backend', 'fastembed')}-{model_name if isinstance(model_name, str) else MODEL_NAME}"
+        CACHE = query_cache.QueryCache(INDEX_PATH, name)
+        model = CACHE.embedder(model)
     return model, index, meta
 
-def embed_query(model, q: str):
-    v = np.array(list(model.embed([q]))[0], dtype=np.float32)[None, :]
+def query_model(index):
+    """The embedder the index was built with, per its manifest; bge-small for older builds."""
+    m = ann.load_manifest(INDEX_PATH)
+    if m is None and index.d == 1536:
+        m = {"embedder": "openai", "model": None}  # text-embedding-3-small, like search.js assumed
+    if m is None:
+        from fastembed import TextEmbedding
+        return TextEmbedding(model_name=MODEL_NAME)
+    model = get_embedder(m["embedder"], m["model"])
+    if hasattr(model, "pause"):
+        model.pause = 0  # the rate-limit pause is for bulk builds, not single queries
+    return model
+
+def embed_queries(model, qs: list[str]):
+    """One embedding call for all of qs; a row per query."""
+    v = np.array(list(model.embed(qs)), dtype=np.float32).reshape(len(qs), -1)
     # cosine: normalize query too
     v = v / (np.linalg.norm(v, axis=1, keepdims=True) + 1e-12)
     return v
 
-def retrieve(model, index, meta, q, k=5):
-    qv = embed_query(model, q)
-    D, I = index.search(qv, k)
-    return [meta[i] for i in I[0]]
+def embed_query(model, q: str):
+    return embed_queries(model, [q])
+
+def lexical_only(q: str) -> bool:
+    """q is all identifiers and there is a BM25 index to look them up in: no embedding needed."""
+    return LEXICAL is not None and bm25.is_identifier_query(q)
+
+def resolve_filters(filters: dict | None) -> dict | None:
+    """filters checked and normalized (attrstore.AttrStore.resolve); ValueError if they are not valid."""
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object")
+    if ATTRS is None:
+        raise ValueError(f"no attribute store next to {INDEX_PATH}; rebuild the index to filter")
+    return ATTRS.resolve(filters)
+
+def retrieve_many(model, index, meta, qs: list[str], ks: list[int],
+                  filters: list[dict | None] | None = None) -> list[list[dict]]:
+    """retrieve for several queries with one embedding call and one index.search per filter.
+
+    Queries answered within the last QUERY_RESULT_TTL seconds skip both. With a
+    BM25 index, dense and lexical rankings are fused (bm25.rrf), and a query of
+    nothing but identifiers (CVE-2021-44228) is answered by BM25 alone. Filtered
+    queries search only the allowed ids (ann.FilteredSearch), never a bigger k.
+    """
+    filters = [resolve_filters(f) for f in filters] if filters else [None] * len(qs)
+    keys = [query_cache.ResultCache.key(query_cache.normalize_query(q), k, f) for q, k, f in zip(qs, ks, filters)]
+    masks = {key[2]: ATTRS.mask(f) if f else None for key, f in zip(keys, filters)}  # one per distinct filter
+    ids = [CACHE.results.get(key) for key in keys] if CACHE else [None] * len(qs)
+    missed = [i for i, r in enumerate(ids) if r is None]
+    for i, q in enumerate(qs):
+        if ids[i] is None and lexical_only(q):
+            # nothing matched: fall back to dense
+            ids[i] = LEXICAL.search(q, ks[i], parts=False, allow=masks[keys[i][2]]) or None
+    todo = [i for i, r in enumerate(ids) if r is None]
+    if todo:
+        X = embed_queries(model, [qs[i] for i in todo])
+        groups = {}  # filter key -> rows of X
+        for j, i in enumerate(todo):
+            groups.setdefault(keys[i][2], []).append(j)
+        for fkey, rows in groups.items():
+            allow = masks[fkey]
+            depth = max(ks[todo[j]] for j in rows)
+            depth = max(depth, FUSE_DEPTH) if LEXICAL else depth
+            D, I = index.search(X[rows], depth) if allow is None else FILTERED.search(X[rows], depth, allow, fkey)
+            for j, row in zip(rows, I):
+                i = todo[j]
+                dense = [int(x) for x in row if x >= 0]  # ANN indexes pad with -1
+                if LEXICAL:
+                    ids[i] = bm25.rrf([dense, LEXICAL.search(qs[i], max(ks[i], FUSE_DEPTH), allow=allow)], ks[i])
+                else:
+                    ids[i] = dense[:ks[i]]
+    if CACHE:
+        for i in missed:
+            CACHE.results.put(keys[i], ids[i])
+    return [[meta[i] for i in row] for row in ids]
+
+def retrieve(model, index, meta, q, k=5, filters: dict | None = None):
+    return retrieve_many(model, index, meta, [q], [k], [filters])[0]
 
 def format_snippets(question, items):
     parts = []
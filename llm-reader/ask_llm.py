@@ -1,24 +1,52 @@
-import os, json, numpy as np, faiss
+import os, numpy as np, faiss
 from openai import OpenAI
 
+import ann
+import bm25
+import metastore
+from query_cache import QueryCache, ResultCache, normalize_query
+
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+EMBED_MODEL = "text-embedding-3-small"
+HYBRID = os.getenv("HYBRID", "1") != "0"  # 0: dense search only, even with an index.bm25
 
 # load index + meta
-index = faiss.read_index("data/index.faiss")
-meta = json.load(open("data/meta.json"))
+index = ann.tune(faiss.read_index("data/index.faiss"))  # FAISS_NPROBE / FAISS_EF_SEARCH
+meta = metastore.open_meta("data/meta.store")
+cache = QueryCache("data/index.faiss", f"openai-{EMBED_MODEL}")  # repeated questions skip the API call
+lexical = bm25.BM25Index("data/index.bm25") if HYBRID and os.path.exists("data/index.bm25") else None
 
 def embed(q):
-    resp = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=q
-    )
-    return np.array(resp.data[0].embedding, dtype=np.float32)
+    key = normalize_query(q)
+    v = cache.embeddings.get(key)
+    if v is None:
+        resp = client.embeddings.create(
+            model=EMBED_MODEL,
+            input=key
+        )
+        v = np.array(resp.data[0].embedding, dtype=np.float32)
+        cache.embeddings.put(key, v)
+    return v
+
+def search(question, k=5):
+    key = ResultCache.key(normalize_query(question), k)
+    ids = cache.results.get(key)
+    if ids is not None:
+        return ids
+    if lexical and bm25.is_identifier_query(question):
+        ids = lexical.search(question, k, parts=False)  # CVE ids and the like: no embedding call
+    if not ids:
+        depth = max(k, 50) if lexical else k
+        qv = embed(question)
+        qv = qv / np.linalg.norm(qv)
+        D,I = index.search(np.array([qv],dtype=np.float32), depth)
+        ids = [int(i) for i in I[0] if i >= 0]
+        ids = bm25.rrf([ids, lexical.search(question, depth)], k) if lexical else ids
+    cache.results.put(key, ids)
+    return ids
 
 def answer(question, k=5):
-    qv = embed(question)
-    qv = qv / np.linalg.norm(qv)
-    D,I = index.search(np.array([qv],dtype=np.float32), k)
-    context = "\n\n".join(meta[i]["text"][:500] for i in I[0])
+    context = "\n\n".join(meta[i]["text"][:500] for i in search(question, k))
     prompt = f"""Answer the question using only the context below:
 
 Context:
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Filterable chunk attributes (source, site, category, timestamp), one row per FAISS id.
+
+Written next to the FAISS index (data/index.attrs for data/index.faiss) by
+build_index.py and read through mmap. A filter becomes a boolean mask over
+record numbers with a few vectorized comparisons, and ann.FilteredSearch turns
+the mask into a FAISS ID selector, so nothing is over-fetched and post-filtered.
+
+Layout (little-endian):
+
+  header    MAGIC, then the length of the JSON that follows (uint64)
+  JSON      {"count": n, "vocab": {"source": [...], "site": [...], "category": [...]}}, padded to 8 bytes
+  time      n int64: epoch seconds of the chunk's timestamp, NO_TIME if it has none
+  codes     n uint32 per field in FIELDS: 1 + position in that field's vocab, 0 if missing
+
+Filters (all optional, all must hold):
+
+  {"source": "clean", "site": ["cisa", "ncsc"], "category": "government",
+   "since": "2026-10-01", "until": 1760000000, "days": 7}
+
+A string field takes a value or a list of them (any of). since/until take an
+ISO-8601 date or time, or epoch seconds; days is short for since = now - days.
+Chunks without a timestamp never pass a time filter.
+
+Usage: python attrstore.py build data/meta.store [data/index.attrs]
+"""
+import os, sys, json, math, mmap, struct, time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import metastore
+
+MAGIC = b"TIATTR01"
+_HEADER = struct.Struct("<8sQ")
+FIELDS = ("source", "site", "category")
+TIME_FIELD = "timestamp"
+NO_TIME = np.iinfo(np.int64).min
+FILTER_KEYS = set(FIELDS) | {"since", "until", "days"}
+
+def attrs_path(index_path: str) -> str:
+    return os.path.splitext(index_path)[0] + ".attrs"
+
+def to_epoch(v) -> int | None:
+    """Epoch seconds of an ISO-8601 string or a number; None if it is neither."""
+    if isinstance(v, bool) or v is None:
+        return None
+    if isinstance(v, (int, float)):
+        return int(v) if math.isfinite(v) else None
+    try:
+        dt = datetime.fromisoformat(str(v).strip())
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+def build(meta_path: str, out_path: str) -> dict:
+    """Attributes of every record of meta_path into out_path (via out_path + ".tmp")."""
+    vocab = {f: {} for f in FIELDS}
+    codes = {f: [] for f in FIELDS}
+    times = []
+    for _, item in metastore.iter_items(meta_path):
+        item = item or {}
+        for f in FIELDS:
+            v = item.get(f)
+            codes[f].append(vocab[f].setdefault(str(v), len(vocab[f]) + 1) if v else 0)
+        t = to_epoch(item.get(TIME_FIELD))
+        times.append(NO_TIME if t is None else t)
+    n = len(times)
+    head = json.dumps({"count": n, "vocab": {f: list(vocab[f]) for f in FIELDS}}, ensure_ascii=False).encode("utf-8")
+    head += b" " * (-len(head) % 8)
+
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(head)))
+        f.write(head)
+        f.write(np.array(times, dtype="<i8").tobytes())
+        for fld in FIELDS:
+            f.write(np.array(codes[fld], dtype="<u4").tobytes())
+    os.replace(tmp, out_path)
+    return {"records": n, **{f: len(vocab[f]) for f in FIELDS},
+            "timestamped": int(sum(t != NO_TIME for t in times))}
+
+class AttrStore:
+    """Read-only view of an index.attrs; mask(filters) -> bool per record number."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_head = _HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not an attribute store")
+        head = json.loads(self.mm[_HEADER.size:_HEADER.size + n_head])
+        self.count = head["count"]
+        self.vocab = {f: {v: i + 1 for i, v in enumerate(head["vocab"][f])} for f in FIELDS}
+        pos = _HEADER.size + n_head
+        self.time = np.frombuffer(self.mm, "<i8", self.count, pos)
+        pos += 8 * self.count
+        self.codes = {}
+        for f in FIELDS:
+            self.codes[f] = np.frombuffer(self.mm, "<u4", self.count, pos)
+            pos += 4 * self.count
+
+    def __len__(self):
+        return self.count
+
+    def values(self, field: str) -> list[str]:
+        return list(self.vocab[field])
+
+    def resolve(self, filters: dict | None) -> dict | None:
+        """filters with days turned into since (to the hour, so repeated filters share a key); None if empty."""
+        if not filters:
+            return None
+        unknown = set(filters) - FILTER_KEYS
+        if unknown:
+            raise ValueError(f"unknown filter {', '.join(sorted(unknown))}; use {', '.join(sorted(FILTER_KEYS))}")
+        out = {}
+        for f in FIELDS:
+            if filters.get(f):
+                v = filters[f]
+                out[f] = sorted({str(x) for x in v}) if isinstance(v, (list, tuple)) else [str(v)]
+        for key in ("since", "until"):
+            if filters.get(key) is not None:
+                t = to_epoch(filters[key])
+                if t is None:
+                    raise ValueError(f"{key}: expected an ISO-8601 date/time or epoch seconds")
+                out[key] = t
+        if filters.get("days") is not None:
+            try:
+                since = int(time.time() - float(filters["days"]) * 86400) // 3600 * 3600
+            except (TypeError, ValueError, OverflowError):  # OverflowError: days = inf
+                raise ValueError("days: expected a number")
+            out["since"] = max(out.get("since", since), since)
+        return out or None
+
+    def mask(self, filters: dict | None) -> np.ndarray | None:
+        """Records that pass the (resolved) filters; None when nothing is filtered."""
+        if not filters:
+            return None
+        m = np.ones(self.count, dtype=bool)
+        for f in FIELDS:
+            if f in filters:
+                wanted = [self.vocab[f][v] for v in filters[f] if v in self.vocab[f]]
+                m &= np.isin(self.codes[f], wanted)  # no known value: nothing passes
+        if "since" in filters:
+            m &= self.time >= filters["since"]
+        if "until" in filters:
+            m &= (self.time <= filters["until"]) & (self.time != NO_TIME)
+        return m
+
+    def close(self):
+        self.time = self.codes = None  # the mmap cannot close while views exist
+        self.mm.close()
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != "build":
+        raise SystemExit(__doc__.strip().splitlines()[-1])
+    out = sys.argv[3] if len(sys.argv) > 3 else os.path.join(os.path.dirname(sys.argv[2]), "index.attrs")
+    print(build(sys.argv[2], out))
+
+if __name__ == "__main__":
+    main()
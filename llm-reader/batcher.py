@@ -0,0 +1,59 @@
+"""Micro-batching in front of query embedding and index search.
+
+Concurrent callers of QueryBatcher.search are queued; one worker thread takes
+the first waiting query, gathers whatever else arrives within max_wait_ms (up
+to max_batch), and answers them all with ask_fast.retrieve_many: one embedding
+call and one index.search for the batch (one per distinct filter). A lone query waits at most
+max_wait_ms extra; under load the batch fills first. If the batch call fails,
+each query is retried alone, so only the ones that fail get the error.
+"""
+import queue, threading, time
+from concurrent.futures import Future
+
+import ask_fast
+
+class QueryBatcher:
+    def __init__(self, model, index, meta, max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.model, self.index, self.meta = model, index, meta
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = queue.Queue()
+        self.batches = self.queries = 0
+        threading.Thread(target=self._run, daemon=True, name="query-batcher").start()
+
+    def search(self, q: str, k: int = 5, filters: dict | None = None, timeout: float | None = None) -> list[dict]:
+        fut = Future()
+        self.queue.put((q, k, filters, fut))
+        return fut.result(timeout)
+
+    def _gather(self) -> list:
+        batch = [self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            left = deadline - time.perf_counter()
+            if left <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=left))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._gather()
+            try:
+                results = ask_fast.retrieve_many(self.model, self.index, self.meta, [q for q, _, _, _ in batch],
+                                                 [k for _, k, _, _ in batch], [f for _, _, f, _ in batch])
+            except Exception:
+                # one bad query must not fail the others: answer each on its own
+                for q, k, f, fut in batch:
+                    try:
+                        fut.set_result(ask_fast.retrieve(self.model, self.index, self.meta, q, k, f))
+                    except Exception as e:
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.queries += len(batch)
+            for (*_, fut), items in zip(batch, results):
+                fut.set_result(items)
@@ -0,0 +1,102 @@
+"""Recall@k and query latency of the ANN index types against exact search, on our corpus.
+
+Usage: python bench_ann.py [--index data/index.faiss] [--queries 500] [--k 10]
+                           [--types hnsw,ivfflat,ivfpq] [--nprobe 4,8,16,32,64] [--ef 16,32,64,128,256]
+                           [--query-file questions.txt]
+
+Vectors are read back from the built index (an IVF-PQ index only gives
+approximate ones, so benchmark from a flat or HNSW build). Queries are sampled
+corpus vectors with a little noise, so the answer is not just the vector itself;
+--query-file embeds real questions, one per line, with the embedder named in
+the index manifest instead. Latency is per single-query search, as the API
+issues them.
+"""
+import argparse, time
+
+import numpy as np
+import faiss
+
+import ann
+from build_index import INDEX_PATH
+
+build_threads = faiss.omp_get_max_threads()  # training and adding use every core
+
+def parse_ints(s: str) -> list[int]:
+    return [int(x) for x in s.split(",") if x]
+
+def load_queries(args, X: np.ndarray) -> np.ndarray:
+    if args.query_file:
+        from embedders import get_embedder
+        m = ann.load_manifest(args.index)
+        if not m:
+            raise SystemExit(f"no manifest next to {args.index}; cannot tell which embedder built it")
+        with open(args.query_file, "r", encoding="utf-8") as f:
+            questions = [l.strip() for l in f if l.strip()]
+        return get_embedder(m["embedder"], m["model"]).embed(questions)
+    rng = np.random.default_rng(698)
+    Q = X[rng.choice(len(X), min(args.queries, len(X)), replace=False)]
+    Q = Q + rng.normal(0, args.noise / np.sqrt(X.shape[1]), Q.shape).astype(np.float32)
+    return Q / np.linalg.norm(Q, axis=1, keepdims=True)
+
+def measure(index, Q: np.ndarray, k: int, truth: np.ndarray, threads: int) -> tuple[float, float, float]:
+    """(recall@k, p50 ms, p99 ms) with one query per search call."""
+    times, hits = [], 0
+    faiss.omp_set_num_threads(threads)
+    for i in range(len(Q)):
+        t0 = time.perf_counter()
+        _, I = index.search(Q[i:i + 1], k)
+        times.append(time.perf_counter() - t0)
+        hits += len(np.intersect1d(I[0][I[0] >= 0], truth[i]))
+    p50, p99 = np.percentile(times, [50, 99]) * 1000
+    faiss.omp_set_num_threads(build_threads)
+    return hits / (len(Q) * k), p50, p99
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--index", default=INDEX_PATH)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--query-file")
+    ap.add_argument("--noise", type=float, default=0.3, help="query noise, as a fraction of unit length")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--types", default="hnsw,ivfflat,ivfpq")
+    ap.add_argument("--nprobe", default="1,4,8,16,32,64")
+    ap.add_argument("--ef", default="16,32,64,128,256")
+    ap.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads (1 = what one API request gets)")
+    args = ap.parse_args()
+
+    src = faiss.read_index(args.index)
+    X, ids = ann.vectors(src)
+    del src
+    Q = load_queries(args, X)
+    print(f"corpus: {len(X)} x {X.shape[1]}  queries: {len(Q)}  k={args.k}  "
+          f"(auto choice for this size: {ann.choose_type(len(X))})")
+
+    flat = ann.make_index("flat", X, ids)
+    _, truth = flat.search(Q, args.k)
+    rows = []
+    _, p50, p99 = measure(flat, Q, args.k, truth, args.threads)
+    rows.append(("flat", "-", 0.0, ann.memory_bytes(flat), 1.0, p50, p99))
+    del flat
+
+    for kind in [t for t in args.types.split(",") if t]:
+        t0 = time.perf_counter()
+        index = ann.make_index(kind, X, ids)
+        build_s = time.perf_counter() - t0
+        mem = ann.memory_bytes(index)
+        if kind == "hnsw":
+            sweep = [("efSearch", v) for v in parse_ints(args.ef)]
+        else:
+            sweep = [("nprobe", v) for v in parse_ints(args.nprobe)]
+        for name, v in sweep:
+            faiss.ParameterSpace().set_index_parameter(index, name, v)
+            recall, p50, p99 = measure(index, Q, args.k, truth, args.threads)
+            rows.append((kind, f"{name}={v}", build_s, mem, recall, p50, p99))
+        del index
+
+    print(f"{'type':<8} {'param':<13} {'build s':>8} {'memory MB':>10} {'recall@' + str(args.k):>10} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    for kind, param, build_s, mem, recall, p50, p99 in rows:
+        print(f"{kind:<8} {param:<13} {build_s:8.2f} {mem / 2**20:10.1f} {recall:10.3f} {p50:8.3f} {p99:8.3f}")
+
+if __name__ == "__main__":
+    main()
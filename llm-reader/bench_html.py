@@ -0,0 +1,100 @@
+"""HTML → text cost and output drift: the old BeautifulSoup + html2text path vs html_text.
+
+Usage: python bench_html.py <dir with saved .html pages> [--repeat N] [--keep-boilerplate] [--min-similarity 0.9]
+
+Also times decoding non-UTF-8 bodies: chardet over the whole body (old) vs the
+bounded-prefix / charset-hint detection in safe_decode.
+"""
+import argparse, glob, os, re, time
+from collections import Counter
+
+import chardet
+import html2text
+from bs4 import BeautifulSoup
+
+from extract_text import safe_decode
+from html_text import html_to_text
+
+_TOKEN = re.compile(r"\w+")
+
+def legacy_html_to_text(html: str) -> str:
+    soup = BeautifulSoup(html, "lxml")
+    for bad in soup(["script", "style", "noscript"]):
+        bad.decompose()
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    h.ignore_images = True
+    h.body_width = 0
+    return h.handle(str(soup))
+
+def legacy_safe_decode(raw: bytes) -> str:
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        enc = chardet.detect(raw).get("encoding") or "utf-8"
+        return raw.decode(enc, errors="replace")
+
+def similarity(old: str, new: str) -> float:
+    """Weighted Jaccard over word tokens (1.0 = same words, same counts)."""
+    a, b = Counter(_TOKEN.findall(old.lower())), Counter(_TOKEN.findall(new.lower()))
+    union = sum((a | b).values())
+    return sum((a & b).values()) / union if union else 1.0
+
+def time_per_page(fn, pages: list, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            fn(page)
+    return (time.perf_counter() - t0) / (repeat * len(pages))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pages_dir")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--keep-boilerplate", action="store_true", help="keep nav/footer/aside, like the old path")
+    ap.add_argument("--min-similarity", type=float, default=0.9)
+    args = ap.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.pages_dir, "*.htm*")))
+    if not paths:
+        raise SystemExit(f"no .html files in {args.pages_dir}")
+    raws = [open(p, "rb").read() for p in paths]
+    pages = [safe_decode(r) for r in raws]
+    strip = not args.keep_boilerplate
+    new_fn = lambda html: html_to_text(html, strip_boilerplate=strip)
+
+    sims = [similarity(legacy_html_to_text(h), new_fn(h)) for h in pages]
+    low = [(s, os.path.basename(p)) for s, p in zip(sims, paths) if s < args.min_similarity]
+
+    old_s = time_per_page(legacy_html_to_text, pages, args.repeat)
+    new_s = time_per_page(new_fn, pages, args.repeat)
+    size = sum(len(r) for r in raws) / len(raws)
+    print(f"pages: {len(pages)}  avg size: {size / 1024:.1f} KiB  boilerplate {'stripped' if strip else 'kept'}")
+    print(f"bs4 + html2text (2 parses):  {old_s * 1000:8.2f} ms/page  {len(pages) / (old_s * len(pages)):7.1f} pages/s")
+    print(f"html_text (lxml, 1 pass):    {new_s * 1000:8.2f} ms/page  {len(pages) / (new_s * len(pages)):7.1f} pages/s")
+    print(f"speedup: {old_s / new_s:.1f}x")
+    sims.sort()
+    print(f"token similarity to the old output: mean {sum(sims) / len(sims):.3f}  "
+          f"p10 {sims[len(sims) // 10]:.3f}  min {sims[0]:.3f}")
+    if low:
+        print(f"{len(low)} page(s) below {args.min_similarity}: "
+              + ", ".join(f"{name} ({s:.2f})" for s, name in sorted(low)[:10]))
+
+    # non-UTF-8 bodies: the same pages re-encoded as windows-1252
+    legacy_bytes = [h.encode("cp1252", errors="replace") for h in pages]
+    legacy_bytes = [b for b in legacy_bytes if not _is_utf8(b)]
+    if legacy_bytes:
+        old_d = time_per_page(legacy_safe_decode, legacy_bytes, 1)
+        new_d = time_per_page(safe_decode, legacy_bytes, 1)
+        print(f"decode {len(legacy_bytes)} non-UTF-8 pages: chardet on whole body {old_d * 1000:.2f} ms/page, "
+              f"bounded prefix {new_d * 1000:.2f} ms/page ({old_d / new_d:.1f}x)")
+
+def _is_utf8(b: bytes) -> bool:
+    try:
+        b.decode("utf-8")
+        return True
+    except UnicodeDecodeError:
+        return False
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Throughput of the retrieval service with and without micro-batching.
+
+Usage: python bench_retrieval.py [--concurrency 1,4,16,64] [--requests 400] [--k 5]
+                                 [--max-batch 32] [--max-wait-ms 5] [--queries questions.txt]
+       python bench_retrieval.py --url http://127.0.0.1:8765 ...   (a running retrieval_server.py, started with QUERY_CACHE=0)
+
+Without --url the index is loaded once (ask_fast.load, same INDEX_PATH /
+META_PATH, query cache off) and served twice in-process, on ephemeral ports: once with
+--max-batch 1 (every request embeds and searches on its own) and once batched.
+Each concurrency level runs that many client threads, each with its own
+keep-alive connection, posting /search back to back until --requests are done.
+"""
+import argparse, http.client, json, threading, time
+from urllib.parse import urlparse
+
+import numpy as np
+
+QUERIES = [
+    "ransomware initial access via phishing", "CVE-2024-3400 PAN-OS command injection",
+    "credential dumping with mimikatz", "Cobalt Strike beacon detection",
+    "lateral movement over SMB", "supply chain compromise of npm packages",
+    "exploited Exchange ProxyShell vulnerabilities", "LockBit affiliate tactics",
+    "business email compromise wire fraud", "zero-day in Ivanti Connect Secure",
+    "DNS tunneling exfiltration", "APT29 cloud tenant intrusion",
+]
+
+def parse_ints(s: str) -> list[int]:
+    return [int(x) for x in s.split(",") if x]
+
+def run_level(host: str, port: int, qs: list[str], k: int, threads: int, total: int) -> tuple[float, float, float, int]:
+    """(queries/s, p50 ms, p99 ms, errors) for total requests over threads connections."""
+    counter = iter(range(total))
+    lock = threading.Lock()
+    times, errors = [], [0]
+
+    def client():
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            body = json.dumps({"q": qs[i % len(qs)], "k": k}).encode("utf-8")  # bytes: one send with the headers
+            t0 = time.perf_counter()
+            conn.request("POST", "/search", body, {"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            dt = time.perf_counter() - t0
+            with lock:
+                times.append(dt)
+                if resp.status != 200:
+                    errors[0] += 1
+        conn.close()
+
+    t0 = time.perf_counter()
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - t0
+    p50, p99 = np.percentile(times, [50, 99]) * 1000
+    return len(times) / wall, p50, p99, errors[0]
+
+def local_servers(max_batch: int, max_wait_ms: float) -> list[tuple[str, str, int]]:
+    """(label, host, port) of an unbatched and a batched server over one loaded index."""
+    import ask_fast
+    from retrieval_server import Retriever, serve
+
+    loaded = ask_fast.load(cache=False)  # the same few queries repeat; measure the work, not the cache
+    ask_fast.embed_query(loaded[0], "warm up")
+    out = []
+    for label, mb in (("unbatched", 1), (f"batch<={max_batch}", max_batch)):
+        r = Retriever(mb, max_wait_ms)
+        r.attach(*loaded)
+        r.ready.set()
+        server, _ = serve(r, "127.0.0.1", 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        out.append((label, "127.0.0.1", server.server_address[1]))
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", help="benchmark a running retrieval_server.py instead")
+    ap.add_argument("--concurrency", default="1,4,16,64")
+    ap.add_argument("--requests", type=int, default=400, help="requests per concurrency level")
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--max-batch", type=int, default=32)
+    ap.add_argument("--max-wait-ms", type=float, default=5.0)
+    ap.add_argument("--queries", help="file with one query per line")
+    args = ap.parse_args()
+
+    qs = QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            qs = [l.strip() for l in f if l.strip()]
+
+    if args.url:
+        u = urlparse(args.url)
+        targets = [(args.url, u.hostname, u.port or 80)]
+    else:
+        targets = local_servers(args.max_batch, args.max_wait_ms)
+
+    print(f"{'server':<12} {'clients':>7} {'qps':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    base = {}
+    for label, host, port in targets:
+        for c in parse_ints(args.concurrency):
+            qps, p50, p99, errs = run_level(host, port, qs, args.k, c, args.requests)
+            gain = f"  x{qps / base[c]:.2f}" if c in base else ""
+            base.setdefault(c, qps)
+            print(f"{label:<12} {c:>7} {qps:9.1f} {p50:8.2f} {p99:8.2f} {errs:>6}{gain}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""BM25 inverted index over the chunks in a meta store, for exact terms and identifiers.
+
+Written next to the FAISS index (data/index.bm25 for data/index.faiss) by
+build_index.py and read through mmap. Doc ids are meta store record numbers,
+the same ids FAISS returns, so the two rankings fuse directly (rrf).
+
+Layout (little-endian):
+
+  header    MAGIC, docs, terms, postings (uint64), average doc length (float64)
+  term_off  terms + 1 uint64: where each term starts in the term text
+  post_off  terms + 1 uint64: where each term's postings start
+  doc_len   docs uint32 (0 for a removed record)
+  post_ids  postings uint32: record numbers, ascending per term
+  post_tf   postings uint16: term frequency in that record
+  term text sorted terms, UTF-8, back to back
+
+A term is found by binary search over the sorted terms and only its postings
+are read, so a one- or two-term identifier query touches a few pages.
+
+Tokens are lowercased runs of letters and digits; ones joined by . - _ : /
+(CVE-2021-44228, 1.12.4, cpe:2.3:a:apache:log4j) are also kept whole, so an
+identifier matches as one term. An identifier inside a longer joined token (a
+URL, CVE-2021-44228/CVE-2021-45046) is indexed as a term of its own as well.
+
+Usage: python bm25.py build data/meta.store [data/index.bm25]
+       python bm25.py search data/index.bm25 "CVE-2021-44228" [k]
+"""
+import os, re, sys, math, mmap, struct
+from array import array
+from collections import Counter, defaultdict
+
+import numpy as np
+
+import metastore
+
+MAGIC = b"TIBM2501"
+_HEADER = struct.Struct("<8sQQQd")
+K1, B = 1.2, 0.75
+RRF_K = 60  # the usual reciprocal rank fusion constant
+
+_TOKEN = re.compile(r"[^\W_]+(?:[._:/-][^\W_]+)*")
+_PART = re.compile(r"[^\W_]+")
+IDENTIFIER = re.compile(r"""(
+      cve-\d{4}-\d{4,}
+    | ghsa(?:-[0-9a-z]{4}){3}
+    | cwe-\d+ | capec-\d+
+    | cpe:[0-9a-z.]+(?::[^:\s]*)+
+    | ms\d{2}-\d{3} | kb\d{6,}
+    | t\d{4}(?:\.\d{3})?              # MITRE ATT&CK technique
+    | [0-9a-f]{32} | [0-9a-f]{40} | [0-9a-f]{64}   # file hashes
+    | \d{1,3}(?:\.\d{1,3}){3}         # IPv4
+)""", re.X)
+_EMBEDDED = re.compile(r"(?<![^\W_])" + IDENTIFIER.pattern + r"(?![^\W_])", re.X)
+
+def bm25_path(index_path: str) -> str:
+    return os.path.splitext(index_path)[0] + ".bm25"
+
+def tokenize(text: str, parts: bool = True) -> list[str]:
+    """Terms of text; parts=False leaves out the pieces of joined tokens (cve, 2021, 44228).
+
+    >>> "cve-2021-44228" in tokenize("see nvd.nist.gov/vuln/detail/CVE-2021-44228 for details")
+    True
+    >>> tokenize("CVE-2021-44228/CVE-2021-45046", parts=False)
+    ['cve-2021-44228/cve-2021-45046', 'cve-2021-44228', 'cve-2021-45046']
+    """
+    out = []
+    for m in _TOKEN.finditer(text.lower()):
+        tok = m.group()
+        out.append(tok)
+        if tok.isalnum():
+            continue
+        if parts:
+            out.extend(_PART.findall(tok))
+        # identifiers inside a longer token (a URL, a list joined by /) are terms of their own
+        out.extend(i.group() for i in _EMBEDDED.finditer(tok) if i.group() != tok)
+    return out
+
+def is_identifier_query(q: str) -> bool:
+    """True when every word of q is an identifier (CVE, CWE, CPE, hash, ...), nothing to embed."""
+    words = q.lower().replace(",", " ").split()
+    return bool(words) and all(IDENTIFIER.fullmatch(w) for w in words)
+
+def doc_text(item: dict) -> str:
+    return f'{item.get("title") or ""}\n{item.get("text") or ""}'
+
+def build(meta_path: str, out_path: str) -> dict:
+    """Index every record of meta_path into out_path (via out_path + ".tmp")."""
+    postings = defaultdict(lambda: (array("I"), array("H")))
+    doc_len = array("I")
+    for i, item in metastore.iter_items(meta_path):
+        toks = tokenize(doc_text(item)) if item else []
+        doc_len.append(len(toks))
+        for t, tf in Counter(toks).items():
+            ids, tfs = postings[t]
+            ids.append(i)
+            tfs.append(min(tf, 65535))
+    live = sum(1 for n in doc_len if n)
+    terms = sorted(postings)
+    blobs = [t.encode("utf-8") for t in terms]
+    term_off = np.zeros(len(terms) + 1, np.uint64)
+    term_off[1:] = np.cumsum([len(b) for b in blobs])
+    post_off = np.zeros(len(terms) + 1, np.uint64)
+    post_off[1:] = np.cumsum([len(postings[t][0]) for t in terms])
+    avgdl = sum(doc_len) / live if live else 0.0
+
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(doc_len), len(terms), int(post_off[-1]), avgdl))
+        f.write(term_off.astype("<u8").tobytes())
+        f.write(post_off.astype("<u8").tobytes())
+        f.write(np.frombuffer(doc_len, np.uint32).astype("<u4").tobytes())
+        for t in terms:
+            f.write(np.frombuffer(postings[t][0], np.uint32).astype("<u4").tobytes())
+        for t in terms:
+            f.write(np.frombuffer(postings[t][1], np.uint16).astype("<u2").tobytes())
+        f.write(b"".join(blobs))
+    os.replace(tmp, out_path)
+    return {"docs": live, "terms": len(terms), "postings": int(post_off[-1])}
+
+class BM25Index:
+    """Read-only view of an index.bm25; search(q, k) -> record numbers, best first."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.docs, self.terms, n_post, self.avgdl = _HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a BM25 index")
+        pos = _HEADER.size
+        for name, dtype, n in _arrays(self.docs, self.terms, n_post):
+            setattr(self, name, np.frombuffer(self.mm, dtype, n, pos))  # views into the mmap, nothing copied
+            pos += np.dtype(dtype).itemsize * n
+        self.text_at = pos
+        self.live = int(np.count_nonzero(self.doc_len))
+
+    def _term(self, j: int) -> bytes:
+        return self.mm[self.text_at + int(self.term_off[j]):self.text_at + int(self.term_off[j + 1])]
+
+    def find(self, term: str) -> int:
+        """Position of term in the sorted term list, or -1."""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.terms and self._term(lo) == key else -1
+
+    def search(self, q: str, k: int = 10, parts: bool = True, allow: np.ndarray | None = None) -> list[int]:
+        """Top k record numbers for q; parts=False matches identifiers only as a whole,
+        allow (a bool per record) keeps only the records it marks."""
+        ids, scores = [], []
+        for t in set(tokenize(q, parts)):
+            j = self.find(t)
+            if j < 0:
+                continue
+            a, b = int(self.post_off[j]), int(self.post_off[j + 1])
+            docs = self.post_ids[a:b]
+            tf = self.post_tf[a:b].astype(np.float32)
+            idf = math.log(1 + (self.live - (b - a) + 0.5) / ((b - a) + 0.5))
+            norm = K1 * (1 - B + B * self.doc_len[docs] / (self.avgdl or 1.0))
+            ids.append(docs)
+            scores.append(idf * tf * (K1 + 1) / (tf + norm))
+        if not ids:
+            return []
+        if len(ids) == 1:
+            ids, scores = ids[0], scores[0]
+        else:  # a record can match several terms
+            ids, inv = np.unique(np.concatenate(ids), return_inverse=True)
+            scores = np.bincount(inv, weights=np.concatenate(scores))
+        if allow is not None:
+            keep = allow[ids]
+            ids, scores = ids[keep], scores[keep]
+        top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [int(i) for i in ids[top]]
+
+    def close(self):
+        for name, _, _ in _arrays(0, 0, 0):
+            setattr(self, name, None)  # the mmap cannot close while views exist
+        self.mm.close()
+
+def _arrays(docs: int, terms: int, postings: int):
+    return (("term_off", "<u8", terms + 1), ("post_off", "<u8", terms + 1), ("doc_len", "<u4", docs),
+            ("post_ids", "<u4", postings), ("post_tf", "<u2", postings))
+
+def rrf(rankings: list[list[int]], k: int, c: int = RRF_K) -> list[int]:
+    """Reciprocal rank fusion: sum of 1 / (c + rank) over the rankings an id appears in."""
+    score = defaultdict(float)
+    for ranking in rankings:
+        for rank, i in enumerate(ranking):
+            score[i] += 1.0 / (c + rank + 1)
+    return sorted(score, key=lambda i: -score[i])[:k]
+
+def main():
+    if len(sys.argv) >= 3 and sys.argv[1] == "build":
+        out = sys.argv[3] if len(sys.argv) > 3 else os.path.join(os.path.dirname(sys.argv[2]), "index.bm25")
+        print(build(sys.argv[2], out))
+    elif len(sys.argv) >= 4 and sys.argv[1] == "search":
+        idx = BM25Index(sys.argv[2])
+        print(idx.search(sys.argv[3], int(sys.argv[4]) if len(sys.argv) > 4 else 10))
+    else:
+        raise SystemExit("\n".join(__doc__.strip().splitlines()[-2:]))
+
+if __name__ == "__main__":
+    main()
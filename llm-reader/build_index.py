@@ -1,47 +1,293 @@
-import time
-import os, json
+#!/usr/bin/env python3
+"""Build the FAISS index and chunk metadata from data/docs.jsonl.
+
+Chunks are streamed in batches: each batch is embedded, added to the index and
+appended to the meta store (metastore.py) before the next one is read, so memory stays at the
+index plus one batch. The embedder and dimension are recorded in a manifest
+next to the index (data/index.manifest.json for data/index.faiss).
+
+Vectors go through the on-disk cache in embed_cache.py, so only new chunk text
+is sent to the embedder. Index ids are record numbers in the meta store;
+--update keeps them: changed chunks are re-added under their old id, removed
+ones are deleted and left as empty records, new ones are appended.
+
+Vectors are streamed into a flat index; when --index-type (see ann.py, default
+picked from the corpus size) is HNSW or IVF, that is converted once at the end.
+The BM25 index for exact terms (bm25.py) and the attribute store for filtered
+search (attrstore.py) are rebuilt from the final meta store on every run, full
+or --update; neither needs embedding.
+
+Usage:
+  python build_index.py                          # openai, text-embedding-3-small
+  python build_index.py --embedder fastembed     # bge-small, what ask_fast.py queries with
+  python build_index.py --embedder sentence-transformers
+  python build_index.py --embedder fastembed --update   # only what changed in docs.jsonl
+  python build_index.py --embedder fastembed --workers 8 --threads-per-worker 4   # all cores
+  python build_index.py --from-meta data/meta.store --index data/index_local.faiss --meta data/meta_local.store
+  python metastore.py export data/meta.store data/meta.json    # for tools that want JSON
+"""
+import os, json, hashlib, argparse
+from datetime import datetime, timezone
+from itertools import islice
+
 import numpy as np
 import faiss
 from tqdm import tqdm
-from openai import OpenAI
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-def embed_texts(texts):
-    resp = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=texts
-    )
-    return [np.array(e.embedding, dtype=np.float32) for e in resp.data]
-
-docs = []
-with open("data/docs.jsonl","r",encoding="utf-8") as f:
-    for line in f:
-        d = json.loads(line)
-        text = d["text"]
-        if not text: continue
-        # split long text into ~500 word chunks
-        chunks = [text[i:i+1500] for i in range(0, len(text), 1500)]
-        for j, ch in enumerate(chunks):
-            docs.append({"id": f'{d["id"]}:{j}', "source": d["source"], "title": d["title"], "text": ch})
-
-print(f"Loaded {len(docs)} chunks")
-
-vecs = []
-BATCH = 20   # smaller batches
-PAUSE = 1.0  # 1 second between batches
-for i in tqdm(range(0,len(docs),20)):
-    batch = [d["text"] for d in docs[i:i+20]]
-    vecs.extend(embed_texts(batch))
-    time.sleep(1) 
-
-index = faiss.IndexFlatIP(len(vecs[0]))
-faiss.normalize_L2(np.array(vecs))
-index.add(np.stack(vecs))
-
-faiss.write_index(index, "data/index.faiss")
-with open("data/meta.json","w",encoding="utf-8") as f:
-    json.dump(docs,f)
-
-print("Index built & saved.")
 
+import ann
+import attrstore
+import bm25
+import metastore
+from dedup import Deduper
+from embed_cache import EmbeddingCache, CachedEmbedder
+from embedders import BACKENDS, ParallelEmbedder, get_embedder
+
+DOCS_PATH = "data/docs.jsonl"
+INDEX_PATH = "data/index.faiss"
+META_PATH = "data/meta.store"
+CHUNK_CHARS = 1500
+ATTR_FIELDS = ("site", "category", "timestamp")  # copied onto each chunk for filtered search (attrstore.py)
+
+def chunk(text, n=CHUNK_CHARS):
+    return [text[i:i+n] for i in range(0, len(text), n)]
+
+def iter_doc_chunks(path: str, n: int = CHUNK_CHARS):
+    """Chunk dicts for every doc in a docs.jsonl, one doc in memory at a time."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            d = json.loads(line)
+            t = d.get("text") or ""
+            attrs = {k: d[k] for k in ATTR_FIELDS if d.get(k)}
+            for j, ch in enumerate(chunk(t, n)):
+                yield {
+                    "id": f'{d.get("id","doc")}:{j}',
+                    "source": d.get("source") or "bucket",
+                    "title": d.get("title") or "Untitled",
+                    **attrs,
+                    "text": ch
+                }
+
+def iter_meta_chunks(path: str):
+    """Chunk dicts of an existing meta store (or meta.json), for re-embedding with another model."""
+    for _, item in metastore.iter_items(path):
+        if item and (item.get("text") or "").strip():
+            yield item
+
+def batches(items, n: int):
+    it = iter(items)
+    while batch := list(islice(it, n)):
+        yield batch
+
+def item_key(item: dict) -> bytes:
+    """Changes when anything stored for a chunk changes, not just its text."""
+    return hashlib.sha1(json.dumps(item, sort_keys=True, ensure_ascii=False).encode("utf-8")).digest()
+
+def unique_chunks(chunks, stats: dict):
+    # the same chunk can come from several docs (shared boilerplate, mirrored pages)
+    seen = Deduper()
+    for c in chunks:
+        if seen.add(c["id"], c["text"]) is None:
+            yield c
+        else:
+            stats["duplicates_skipped"] += 1
+
+def open_index(index_path: str):
+    """The index, ready for add_with_ids/remove_ids; a plain flat index from an older build is wrapped."""
+    index = faiss.read_index(index_path)
+    if isinstance(index, faiss.IndexIDMap2) or ann.kind_of(index) != "flat":
+        return index
+    wrapped = faiss.IndexIDMap2(faiss.IndexFlatIP(index.d))
+    wrapped.add_with_ids(index.reconstruct_n(0, index.ntotal), np.arange(index.ntotal, dtype=np.int64))
+    return wrapped
+
+def write_outputs(index, index_path: str, meta: metastore.StoreWriter, meta_path: str, manifest: dict) -> dict:
+    index_tmp = index_path + ".tmp"
+    try:
+        faiss.write_index(index, index_tmp)
+    except BaseException:
+        meta.abort()
+        raise
+    os.replace(index_tmp, index_path)
+    os.replace(meta.tmp, meta_path)
+    lexical = bm25.build(meta_path, bm25.bm25_path(index_path))
+    attrs = attrstore.build(meta_path, attrstore.attrs_path(index_path))
+    manifest.update({
+        "dim": index.d,
+        "metric": "inner_product",
+        "normalized": True,
+        "index_type": ann.kind_of(index),
+        "nprobe": ann.NPROBE if ann.kind_of(index).startswith("ivf") else None,
+        "efSearch": ann.EF_SEARCH if ann.kind_of(index) == "hnsw" else None,
+        "count": index.ntotal,
+        "slots": meta.count,
+        "meta": os.path.basename(meta_path),
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "version": ann.content_version(index_path, meta_path),  # query caches are keyed on this
+        "bm25": {"file": os.path.basename(bm25.bm25_path(index_path)), **lexical},
+        "attrs": {"file": os.path.basename(attrstore.attrs_path(index_path)), **attrs},
+    })
+    with open(ann.manifest_path(index_path), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def build(embedder, chunks, index_path: str = INDEX_PATH, meta_path: str = META_PATH,
+          batch: int | None = None, dedup: bool = True, source: str | None = None,
+          index_type: str = "auto") -> dict:
+    """Embed chunks into a new index + meta; both replace the old files only at the end."""
+    stats = {"duplicates_skipped": 0}
+    if dedup:
+        chunks = unique_chunks(chunks, stats)
+    index = None
+    meta = metastore.StoreWriter(meta_path)
+    try:
+        for b in tqdm(batches(chunks, batch or embedder.batch), unit="batch", desc="Embedding"):
+            X = embedder.embed([c["text"] for c in b])
+            if index is None:
+                index = faiss.IndexIDMap2(faiss.IndexFlatIP(X.shape[1]))
+            index.add_with_ids(X, np.arange(meta.count, meta.count + len(b), dtype=np.int64))
+            meta.write(b)
+        meta.close()
+        if index is None:
+            raise SystemExit("no chunks to index")
+        kind = ann.choose_type(index.ntotal) if index_type == "auto" else index_type
+        if kind != "flat":
+            print(f"Building {kind} index over {index.ntotal} vectors")
+            X, ids = ann.vectors(index)
+            index = None  # drop the flat copy before the new one is filled
+            index = ann.make_index(kind, X, ids)
+    except BaseException:
+        meta.abort()
+        raise
+    return write_outputs(index, index_path, meta, meta_path, {
+        "embedder": embedder.backend, "model": embedder.model, **stats,
+        "chunk_chars": CHUNK_CHARS, "source": source, "mode": "full"})
+
+def update(embedder, chunks, index_path: str = INDEX_PATH, meta_path: str = META_PATH,
+           batch: int | None = None, dedup: bool = True, source: str | None = None,
+           index_type: str = "auto") -> dict:
+    """Apply the difference between chunks and the current meta store to the index."""
+    old_manifest = ann.load_manifest(index_path) or {}
+    if old_manifest.get("model") not in (None, embedder.model):
+        raise SystemExit(f"{index_path} was built with {old_manifest['model']}; "
+                         f"run a full build to switch to {embedder.model}")
+    index = open_index(index_path)
+    if index_type not in ("auto", ann.kind_of(index)):
+        raise SystemExit(f"{index_path} is {ann.kind_of(index)}; run a full build to switch to {index_type}")
+
+    old = {}  # chunk id -> (meta position, item key)
+    slots = 0
+    for i, item in metastore.iter_items(meta_path):
+        slots = i + 1
+        if item:
+            old[item["id"]] = (i, item_key(item))
+
+    stats = {"duplicates_skipped": 0, "unchanged": 0, "changed": 0, "added": 0, "removed": 0}
+    if dedup:
+        chunks = unique_chunks(chunks, stats)
+    delta = {}  # meta position -> new item
+    pending = []
+
+    def flush():
+        if not pending:
+            return
+        ids = np.array([i for i, _ in pending], dtype=np.int64)
+        X = embedder.embed([c["text"] for _, c in pending])
+        if index.d != X.shape[1]:
+            raise SystemExit(f"embedder returns dim {X.shape[1]}, index has {index.d}")
+        index.remove_ids(ids)  # the old vectors of changed chunks
+        index.add_with_ids(X, ids)
+        pending.clear()
+
+    next_id = slots
+    for c in tqdm(chunks, unit="chunk", desc="Comparing"):
+        prev = old.pop(c["id"], None)
+        if prev and prev[1] == item_key(c):
+            stats["unchanged"] += 1
+            continue
+        if prev:
+            pos = prev[0]
+            stats["changed"] += 1
+        else:
+            pos, next_id = next_id, next_id + 1
+            stats["added"] += 1
+        delta[pos] = c
+        pending.append((pos, c))
+        if len(pending) >= (batch or embedder.batch):
+            flush()
+    flush()
+    gone = {pos for pos, _ in old.values()}
+    stats["removed"] = len(gone)
+    if gone:
+        index.remove_ids(np.array(sorted(gone), dtype=np.int64))
+
+    # ids stay record numbers: rewrite the store in order, empty records for removed chunks
+    meta = metastore.StoreWriter(meta_path)
+    try:
+        for i, item in metastore.iter_items(meta_path):
+            meta.write([delta.get(i, None if i in gone else item)])
+        meta.write([delta[pos] for pos in range(slots, next_id)])
+        meta.close()
+    except BaseException:
+        meta.abort()
+        raise
+    return write_outputs(index, index_path, meta, meta_path, {
+        "embedder": embedder.backend, "model": embedder.model, **stats,
+        "chunk_chars": CHUNK_CHARS, "source": source, "mode": "update"})
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--embedder", choices=list(BACKENDS), default="openai")
+    ap.add_argument("--model", help="model name for the backend (default: the backend's usual one)")
+    ap.add_argument("--docs", default=DOCS_PATH)
+    ap.add_argument("--from-meta", metavar="META", help="re-embed an existing meta store (or meta.json) instead of chunking docs")
+    ap.add_argument("--index", default=INDEX_PATH)
+    ap.add_argument("--meta", default=META_PATH)
+    ap.add_argument("--batch", type=int, help="chunks per embedding call (default: per backend)")
+    ap.add_argument("--no-dedup", action="store_true", help="embed near-duplicate chunks too")
+    ap.add_argument("--update", action="store_true", help="apply only what changed since the last build")
+    ap.add_argument("--no-cache", action="store_true", help="embed every chunk, bypassing data/embed_cache")
+    ap.add_argument("--workers", type=int, default=int(os.getenv("EMBED_WORKERS", "0")),
+                    help="embedding processes, each with its own model (0/1 = in this process)")
+    ap.add_argument("--threads-per-worker", type=int, help="intra-op threads per worker (default: cores / workers)")
+    ap.add_argument("--worker-batch", type=int, help="texts per worker call (default: per backend)")
+    ap.add_argument("--index-type", choices=("auto",) + ann.TYPES, default="auto",
+                    help="FAISS index kind (default: chosen from the corpus size)")
+    args = ap.parse_args(argv)
+
+    base = get_embedder(args.embedder, args.model, args.workers, args.threads_per_worker, args.worker_batch)
+    embedder = base if args.no_cache else CachedEmbedder(base, EmbeddingCache(base.model))
+    source = args.from_meta or args.docs
+    chunks = iter_meta_chunks(source) if args.from_meta else iter_doc_chunks(source)
+    update_existing = args.update and os.path.exists(args.index) and os.path.exists(args.meta)
+    if update_existing and not ann.supports_remove(faiss.read_index(args.index)):
+        # HNSW cannot delete; rebuilding is cheap since unchanged chunks come from the cache
+        print(f"{args.index} is an HNSW index, which cannot delete vectors; rebuilding it")
+        update_existing = False
+        if args.index_type == "auto":
+            args.index_type = "hnsw"
+    run = update if update_existing else build
+    try:
+        m = run(embedder, chunks, args.index, args.meta, args.batch, not args.no_dedup, source, args.index_type)
+    finally:
+        if isinstance(base, ParallelEmbedder):
+            base.close()
+
+    print(f"{'Updated' if update_existing else 'Built'} {m['index_type']} index: {m['count']} vectors "
+          f"({m['embedder']} {m['model']}, dim {m['dim']}); "
+          f"{m['duplicates_skipped']} near-duplicate chunks skipped")
+    if update_existing:
+        print(f"  {m['unchanged']} unchanged, {m['changed']} changed, {m['added']} added, {m['removed']} removed; "
+              f"{m['slots'] - m['count']} empty meta records (a full build compacts them)")
+    if isinstance(embedder, CachedEmbedder):
+        print(f"  embedding cache: {embedder.hits} hits, {embedder.misses} embedded")
+    if isinstance(base, ParallelEmbedder) and base.embedded:
+        print(f"  parallel embedding: {base.embedded} chunks in {base.seconds:.1f}s = {base.rate():.1f} chunks/s "
+              f"({base.workers} workers x {base.threads} threads, {base.shard} per call)")
+    print(f"Saved index -> {args.index}")
+    print(f"Saved meta  -> {args.meta}")
+    print(f"Saved BM25  -> {bm25.bm25_path(args.index)} ({m['bm25']['terms']} terms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Near-duplicate removal between extract_text.py and the index builders.
+
+Streaming passes over docs.jsonl:
+  1. count how many docs each short line appears in; lines found in at least
+     BOILERPLATE_DOCS docs (nav, footers, cookie banners) are kept only in the
+     first doc that has them
+  2. MinHash what is left of each doc and look it up in LSH bands; a doc whose
+     estimated Jaccard similarity to an earlier kept doc is >= THRESHOLD is
+     dropped; kept docs go to a side file
+  3. the side file is copied to the output with the dropped ids merged into
+     each kept doc's "dup_ids"
+
+Usage: python dedup.py [in.jsonl] [out.jsonl]   (default: data/docs.jsonl, in place)
+"""
+import os, re, sys, json, zlib, hashlib
+from collections import Counter, defaultdict
+
+import numpy as np
+
+DOCS_PATH = "data/docs.jsonl"
+THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))      # estimated Jaccard that counts as a duplicate
+BOILERPLATE_DOCS = int(os.getenv("DEDUP_BOILERPLATE_DOCS", "5"))  # a line in this many docs is boilerplate
+BOILERPLATE_MAX_CHARS = 300  # longer lines are content; MinHash catches repeated paragraphs
+SHINGLE = 5     # words per shingle
+NUM_PERM = 128  # MinHash signature length (uint32 each, 512 bytes per doc)
+BANDS = 16      # LSH bands of NUM_PERM // BANDS rows; ~95% of 0.8-similar pairs become candidates
+
+_WORD = re.compile(r"\w+")
+_rng = np.random.default_rng(698)  # fixed, so signatures are stable across runs
+_A = _rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) | np.uint64(1)  # odd multipliers
+_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+
+def shingles(text: str) -> np.ndarray:
+    """crc32 of every SHINGLE-word window (the whole text if it is shorter)."""
+    words = _WORD.findall(text.lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    n = max(len(words) - SHINGLE + 1, 1)
+    hs = {zlib.crc32(" ".join(words[i:i + SHINGLE]).encode("utf-8")) for i in range(n)}
+    return np.fromiter(hs, dtype=np.uint64, count=len(hs))
+
+def minhash(text: str) -> np.ndarray | None:
+    """NUM_PERM multiply-shift hashes of the shingle set, min per hash; None for no words."""
+    x = shingles(text)
+    if not len(x):
+        return None
+    sig = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    with np.errstate(over="ignore"):  # uint64 wrap-around is the hash
+        for i in range(0, len(x), 4096):  # bounded temporary: 4096 x NUM_PERM
+            block = (x[i:i + 4096, None] * _A + _B) >> np.uint64(32)
+            np.minimum(sig, block.min(axis=0), out=sig)
+    return sig.astype(np.uint32)
+
+class Deduper:
+    """MinHash + LSH banding over everything added so far."""
+
+    def __init__(self, threshold: float = THRESHOLD, bands: int = BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+        self.sigs = {}
+
+    def add(self, key: str, text: str) -> str | None:
+        """Remember text under key, unless it near-duplicates something already
+        added: then return that key and remember nothing."""
+        sig = minhash(text)
+        if sig is None:
+            return None
+        bands = [sig[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+        seen = set()
+        for bucket, band in zip(self.buckets, bands):
+            for other in bucket.get(band, ()):
+                if other in seen:
+                    continue
+                seen.add(other)
+                if np.count_nonzero(self.sigs[other] == sig) >= self.threshold * NUM_PERM:
+                    return other
+        self.sigs[key] = sig
+        for bucket, band in zip(self.buckets, bands):
+            bucket[band].append(key)
+        return None
+
+def _line_key(line: str) -> bytes | None:
+    norm = " ".join(line.lower().split())
+    if not norm or len(norm) > BOILERPLATE_MAX_CHARS or norm.startswith("#"):
+        return None  # headings repeat across pages but carry the structure of each one
+    return hashlib.blake2b(norm.encode("utf-8"), digest_size=8).digest()
+
+def iter_docs(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def boilerplate_lines(path: str) -> set[bytes]:
+    """Keys of lines that appear in at least BOILERPLATE_DOCS docs."""
+    df = Counter()
+    for d in iter_docs(path):
+        df.update({k for l in (d.get("text") or "").splitlines() if (k := _line_key(l))})
+    return {k for k, n in df.items() if n >= BOILERPLATE_DOCS}
+
+def strip_boilerplate(text: str, common: set[bytes], seen: set[bytes]) -> tuple[str, int]:
+    """text without common lines already kept in an earlier doc, and how many were cut."""
+    kept, cut = [], 0
+    for line in text.splitlines():
+        k = _line_key(line)
+        if k in common:
+            if k in seen:
+                cut += 1
+                continue
+            seen.add(k)
+        kept.append(line)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip(), cut
+
+def main():
+    src = sys.argv[1] if len(sys.argv) > 1 else DOCS_PATH
+    dst = sys.argv[2] if len(sys.argv) > 2 else src
+
+    common = boilerplate_lines(src)
+    seen_lines, dedup = set(), Deduper()
+    dup_ids = defaultdict(list)
+    n_in = n_out = n_dup = n_empty = n_lines = n_stripped = chars_in = chars_out = 0
+    kept_path = dst + ".kept"
+    with open(kept_path, "w", encoding="utf-8") as out:
+        for d in iter_docs(src):
+            n_in += 1
+            text = d.get("text") or ""
+            chars_in += len(text)
+            text, cut = strip_boilerplate(text, common, seen_lines)
+            n_lines += cut
+            n_stripped += cut > 0
+            if not text:
+                n_empty += 1
+                continue
+            other = dedup.add(d["id"], text)
+            if other is not None:
+                n_dup += 1
+                dup_ids[other].append(d["id"])
+                continue
+            d["text"] = text
+            n_out += 1
+            chars_out += len(text)
+            out.write(json.dumps(d, ensure_ascii=False) + "\n")
+    del dedup
+
+    # merged ids are only known once the whole corpus is seen
+    tmp = dst + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as out:
+        for d in iter_docs(kept_path):
+            if dup_ids.get(d["id"]):
+                d["dup_ids"] = dup_ids[d["id"]]
+            out.write(json.dumps(d, ensure_ascii=False) + "\n")
+    os.replace(tmp, dst)
+    os.remove(kept_path)
+
+    print(f"{n_in} docs in, {n_out} kept -> {dst}")
+    print(f"  {n_dup} near-duplicates merged (Jaccard >= {THRESHOLD}), {n_empty} boilerplate-only dropped")
+    print(f"  {len(common)} boilerplate lines, {n_lines} repeats cut from {n_stripped} docs")
+    if chars_in:
+        print(f"  text {chars_in:,} -> {chars_out:,} chars ({100 * (1 - chars_out / chars_in):.1f}% less to embed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""On-disk embedding cache keyed by (model, sha1 of the chunk text).
+
+One directory per model under data/embed_cache/ holds two append-only files:
+keys.bin (20-byte sha1 digests) and vectors.f32 (float32 rows, memory-mapped
+for reads), so a lookup only touches the rows it needs. A row is written
+before its key, and on open both files are cut back to the rows they both
+hold, so an interrupted run never leaves a key without its vector.
+"""
+import os, re, json, hashlib
+
+import numpy as np
+
+CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "data/embed_cache")
+KEY_BYTES = 20
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+class EmbeddingCache:
+    def __init__(self, model: str, root: str = CACHE_DIR):
+        self.model = model
+        self.dir = os.path.join(root, re.sub(r"[^\w.-]+", "_", model))
+        os.makedirs(self.dir, exist_ok=True)
+        self.keys_path = os.path.join(self.dir, "keys.bin")
+        self.vecs_path = os.path.join(self.dir, "vectors.f32")
+        self.info_path = os.path.join(self.dir, "info.json")
+        self.rows = {}  # key -> row
+        self.dim = None
+        self._mm = None
+        if os.path.exists(self.info_path):
+            with open(self.info_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+            self._load()
+
+    def _load(self):
+        n_keys = os.path.getsize(self.keys_path) // KEY_BYTES if os.path.exists(self.keys_path) else 0
+        n_vecs = os.path.getsize(self.vecs_path) // (4 * self.dim) if os.path.exists(self.vecs_path) else 0
+        n = min(n_keys, n_vecs)
+        for path, size in ((self.keys_path, n * KEY_BYTES), (self.vecs_path, n * 4 * self.dim)):
+            with open(path, "ab") as f:
+                f.truncate(size)
+        with open(self.keys_path, "rb") as f:
+            data = f.read()
+        self.rows = {data[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(n)}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, rows: list[int]) -> np.ndarray:
+        if self._mm is None or len(self._mm) < len(self.rows):
+            self._mm = np.memmap(self.vecs_path, dtype=np.float32, mode="r", shape=(len(self.rows), self.dim))
+        return np.asarray(self._mm[rows])
+
+    def put(self, keys: list[bytes], X: np.ndarray):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if self.dim is None:
+            self.dim = X.shape[1]
+            with open(self.info_path, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model, "dim": self.dim}, f)
+        elif X.shape[1] != self.dim:
+            raise ValueError(f"cache for {self.model} holds dim {self.dim}, got {X.shape[1]}")
+        new = {}
+        for i, k in enumerate(keys):
+            if k not in self.rows and k not in new:
+                new[k] = i
+        if not new:
+            return
+        with open(self.vecs_path, "ab") as f:
+            f.write(X[list(new.values())].tobytes())
+        with open(self.keys_path, "ab") as f:
+            f.write(b"".join(new))
+        base = len(self.rows)
+        self.rows.update((k, base + j) for j, k in enumerate(new))
+
+class CachedEmbedder:
+    """Wraps an embedder so only texts missing from the cache reach it."""
+
+    def __init__(self, embedder, cache: EmbeddingCache):
+        self.embedder = embedder
+        self.cache = cache
+        self.backend, self.model, self.batch = embedder.backend, embedder.model, embedder.batch
+        self.hits = self.misses = 0
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        keys = [text_key(t) for t in texts]
+        rows = [self.cache.rows.get(k) for k in keys]
+        miss = [i for i, r in enumerate(rows) if r is None]
+        self.misses += len(miss)
+        self.hits += len(texts) - len(miss)
+        if miss:
+            self.cache.put([keys[i] for i in miss], self.embedder.embed([texts[i] for i in miss]))
+        return self.cache.get([self.cache.rows[k] for k in keys])
@@ -0,0 +1,122 @@
+"""Embedding backends for the index builder.
+
+Each backend turns a list of texts into L2-normalized float32 rows, so the
+index can use inner product as cosine similarity. Libraries are imported
+when a backend is built, so only the one in use has to be installed.
+
+ParallelEmbedder shards each batch across worker processes, each holding its
+own model with a capped number of intra-op threads.
+"""
+import os, time, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+def normalize(X: np.ndarray) -> np.ndarray:
+    X = np.asarray(X, dtype=np.float32)
+    return X / (np.linalg.norm(X, axis=1, keepdims=True) + 1e-12)
+
+class OpenAIEmbedder:
+    backend = "openai"
+    default_model = "text-embedding-3-small"
+    batch = 20
+
+    def __init__(self, model: str | None = None, threads: int | None = None, pause: float = 1.0):
+        from openai import OpenAI
+        self.model = model or self.default_model
+        self.pause = pause  # seconds between requests, to stay under the rate limit
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self._calls = 0
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        if self._calls and self.pause:
+            time.sleep(self.pause)
+        self._calls += 1
+        resp = self.client.embeddings.create(model=self.model, input=texts)
+        return normalize([e.embedding for e in resp.data])
+
+class FastEmbedEmbedder:
+    backend = "fastembed"
+    default_model = "BAAI/bge-small-en-v1.5"
+    batch = 256
+
+    def __init__(self, model: str | None = None, threads: int | None = None):
+        from fastembed import TextEmbedding
+        self.model = model or self.default_model
+        self._model = TextEmbedding(model_name=self.model, threads=threads)
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        return normalize(np.vstack(list(self._model.embed(texts))))
+
+class SentenceTransformerEmbedder:
+    backend = "sentence-transformers"
+    default_model = "sentence-transformers/all-MiniLM-L6-v2"
+    batch = 64
+
+    def __init__(self, model: str | None = None, threads: int | None = None):
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = model or self.default_model
+        self._model = SentenceTransformer(self.model)
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        X = self._model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(X, dtype=np.float32)
+
+BACKENDS = {cls.backend: cls for cls in (OpenAIEmbedder, FastEmbedEmbedder, SentenceTransformerEmbedder)}
+
+_worker = None  # the model of this worker process
+
+def _init_worker(cls, model, threads):
+    # before the backend loads its runtime, so ONNX / torch / BLAS pick the cap up
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    global _worker
+    _worker = cls(model, threads=threads)
+
+def _embed_shard(texts):
+    return _worker.embed(texts)
+
+class ParallelEmbedder:
+    """One model per worker process; a batch is split into shards of `shard`
+    texts and the rows come back in the original order."""
+
+    def __init__(self, cls, model: str | None = None, workers: int = 2,
+                 threads: int | None = None, shard: int | None = None):
+        self.backend = cls.backend
+        self.model = model or cls.default_model
+        self.workers = workers
+        self.threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        self.shard = shard or cls.batch
+        self.batch = self.shard * workers  # one shard per worker per call
+        self.pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=(cls, self.model, self.threads))
+        self.embedded = 0
+        self.seconds = 0.0
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        t0 = time.perf_counter()
+        shards = [texts[i:i + self.shard] for i in range(0, len(texts), self.shard)]
+        X = np.vstack(list(self.pool.map(_embed_shard, shards)))
+        self.seconds += time.perf_counter() - t0
+        self.embedded += len(texts)
+        return X
+
+    def rate(self) -> float:
+        return self.embedded / self.seconds if self.seconds else 0.0
+
+    def close(self):
+        self.pool.shutdown()
+
+def get_embedder(backend: str, model: str | None = None, workers: int = 0,
+                 threads: int | None = None, shard: int | None = None):
+    """The backend in this process, or sharded over `workers` processes when workers > 1."""
+    try:
+        cls = BACKENDS[backend]
+    except KeyError:
+        raise SystemExit(f"unknown embedder {backend!r}; choose from {', '.join(BACKENDS)}")
+    if workers > 1:
+        return ParallelEmbedder(cls, model, workers, threads, shard)
+    return cls(model, threads=threads)
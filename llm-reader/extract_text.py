@@ -1,16 +1,31 @@
 #!/usr/bin/env python3
-import os, json, sys, io
+import os, re, json, sys, io, gzip, zlib, codecs, hashlib, multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import boto3
+from botocore.config import Config
 from tqdm import tqdm
 import chardet
-from bs4 import BeautifulSoup
-import html2text
+
+import jsonstream
+from html_text import html_to_text
 
 # === SETTINGS (change to your bucket name) ===============================
 AWS_PROFILE = os.getenv("AWS_PROFILE", "llm-s3")
 BUCKET = os.getenv("S3_BUCKET", "project698")
 OUT_PATH = "data/docs.jsonl"
-MAX_BYTES = 5_000_000  # skip files bigger than ~5 MB for this first pass
+STREAM_BYTES = int(float(os.getenv("EXTRACT_STREAM_MB", "8")) * 1024 * 1024)  # larger JSON/JSONL is streamed
+CHUNK_BYTES = 1024 * 1024  # read size when streaming
+SNIFF_BYTES = 64 * 1024    # prefix used to pick a streamed object's encoding
+DOWNLOADS = int(os.getenv("EXTRACT_DOWNLOADS", "16"))        # concurrent S3 GETs
+WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))  # decode/convert processes, 0 = inline
+WINDOW = int(os.getenv("EXTRACT_WINDOW", str(4 * DOWNLOADS)))  # objects in flight ahead of the writer
+
+# Incremental runs: only objects whose ETag/LastModified/Size changed are re-read
+LEDGER_PATH = os.getenv("EXTRACT_LEDGER", "data/extract_ledger.json")
+SEGMENT_DIR = os.getenv("EXTRACT_SEGMENTS", "data/segments")  # docs of each object, one file per key
+FULL = os.getenv("EXTRACT_FULL", "0") == "1"  # ignore the ledger and re-read everything
+LEDGER_VERSION = 4  # bump when conversion output changes so old segments are rebuilt
 
 # File types we'll try to read/convert
 TEXT_TYPES = (".txt", ".md", ".csv", ".xml")
@@ -18,9 +33,12 @@ HTML_TYPES = (".html", ".htm")
 JSON_TYPES = (".json", ".jsonl")
 
 # Which JSON fields might contain the real text/title/url
-TEXT_FIELDS = ["text", "content", "body", "article", "full_text", "textContent", "summary"]
+TEXT_FIELDS = ["text", "content", "body", "article", "full_text", "textContent", "summary",
+               "text_sample"]  # scraper clean rows: the page text, not the row as one JSON line
 TITLE_FIELDS = ["title", "headline", "name"]
 URL_FIELDS = ["url", "link", "canonical_url", "source_url"]
+# Scraper row fields kept on the doc as-is, so retrieval can filter on them
+ATTR_FIELDS = ["site", "category", "timestamp"]
 
 # === HELPERS ==============================================================
 
@@ -31,43 +49,305 @@ def ext_of(key: str) -> str:
             return ext
     return ""
 
-def safe_decode(raw: bytes) -> str:
-    """Try utf-8 first, then detect encoding if needed."""
+_BOMS = ((codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"), (codecs.BOM_UTF8, "utf-8-sig"),
+         (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+_HTTP_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+_META_CHARSET = re.compile(rb"<meta[^>]{0,200}?charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+
+def bom_encoding(prefix: bytes) -> str | None:
+    for bom, enc in _BOMS:
+        if prefix.startswith(bom):
+            return enc
+    return None
+
+def hinted_encoding(prefix: bytes, content_type: str | None = None) -> str:
+    """Encoding for a body that is not UTF-8: the HTTP charset, then a <meta> charset,
+    then chardet. Only a bounded prefix of the body is ever looked at."""
+    prefix = prefix[:SNIFF_BYTES]
+    for m in (_HTTP_CHARSET.search(content_type or ""), _META_CHARSET.search(prefix[:4096])):
+        if m:
+            enc = m.group(1).decode("ascii", "ignore") if isinstance(m.group(1), bytes) else m.group(1)
+            try:
+                if codecs.lookup(enc).name != "utf-8":  # a utf-8 label on a non-utf-8 body is wrong
+                    return enc
+            except LookupError:
+                pass
+    return chardet.detect(prefix).get("encoding") or "utf-8"
+
+def safe_decode(raw: bytes, content_type: str | None = None) -> str:
+    """Try utf-8 first (after any BOM), then charset hints / detection on a bounded prefix."""
+    enc = bom_encoding(raw[:4])
+    if enc:
+        return raw.decode(enc, errors="replace")
     try:
         return raw.decode("utf-8")
     except UnicodeDecodeError:
-        enc = chardet.detect(raw).get("encoding") or "utf-8"
+        enc = hinted_encoding(raw, content_type)
         try:
             return raw.decode(enc, errors="replace")
         except Exception:
             return raw.decode("utf-8", errors="replace")
 
-def html_to_text(html: str) -> str:
-    # Strip scripts/styles, convert to readable markdown-ish text
-    soup = BeautifulSoup(html, "lxml")
-    for bad in soup(["script", "style", "noscript"]):
-        bad.decompose()
-    h = html2text.HTML2Text()
-    h.ignore_links = False
-    h.ignore_images = True
-    h.body_width = 0
-    return h.handle(str(soup))
-
 def pick(d: dict, fields: list[str]):
     for k in fields:
         if k in d and d[k]:
             return d[k]
     return None
 
-def to_doc(record_id: str, source: str, title: str, url: str, text: str) -> dict:
+def doc_attrs(d: dict) -> dict:
+    return {k: d[k] for k in ATTR_FIELDS if d.get(k) not in (None, "")}
+
+def to_doc(record_id: str, source: str, title: str, url: str, text: str, attrs: dict | None = None) -> dict:
     return {
         "id": record_id,
         "source": source,
         "title": title or source or "Untitled",
         "url": url,
+        **(attrs or {}),
         "text": text.strip()
     }
 
+# === CONVERSION ===========================================================
+
+def item_doc(key: str, source: str, i: int, item) -> dict | None:
+    """Doc for one element of a top-level JSON array."""
+    if not isinstance(item, dict):
+        return None
+    t = pick(item, TEXT_FIELDS)
+    if not t:
+        return None
+    ti = pick(item, TITLE_FIELDS)
+    u = pick(item, URL_FIELDS)
+    return to_doc(f"{key}:{i}", source, ti, u, str(t), doc_attrs(item))
+
+def object_doc(key: str, source: str, objj: dict) -> dict:
+    """Doc for a top-level JSON object."""
+    t = pick(objj, TEXT_FIELDS) or ""
+    ti = pick(objj, TITLE_FIELDS)
+    u = pick(objj, URL_FIELDS)
+    if not t:
+        # if no obvious text field, just store the whole json minified as text
+        t = json.dumps(objj, ensure_ascii=False)
+    return to_doc(key, source, ti, u, str(t), doc_attrs(objj))
+
+def line_doc(key: str, source: str, i: int, line: str) -> dict | None:
+    """Doc for one JSONL line."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        rec = json.loads(line)
+    except Exception:
+        return None
+    t = pick(rec, TEXT_FIELDS) or ""
+    ti = pick(rec, TITLE_FIELDS)
+    u = pick(rec, URL_FIELDS)
+    if not t:
+        # fallback: keep minified record text
+        t = json.dumps(rec, ensure_ascii=False)
+    return to_doc(f"{key}:{i}", source, ti, u, str(t), doc_attrs(rec))
+
+def source_of(key: str) -> str:
+    return key.split("/")[0] if "/" in key else "bucket"
+
+def convert(key: str, body: bytes, content_type: str | None = None) -> tuple[list[dict], bool]:
+    """Docs for one downloaded object, plus whether the object was skipped.
+    Runs in the worker processes, so it only touches its arguments."""
+    gz = key.lower().endswith(".gz")  # scraper output is gzip-compressed jsonl
+    ext = ext_of(key[:-3] if gz else key)
+    if gz:
+        try:
+            body = gzip.decompress(body)
+        except Exception:
+            return [], True
+
+    docs = []
+    text = ""
+    source = source_of(key)
+
+    # Handle by type
+    if ext in TEXT_TYPES:
+        text = safe_decode(body, content_type)
+
+    elif ext in HTML_TYPES:
+        html = safe_decode(body, content_type)
+        text = html_to_text(html)
+
+    elif ext == ".json":
+        raw = safe_decode(body, content_type)
+        try:
+            objj = json.loads(raw)
+        except Exception:
+            return [], True
+
+        # If it's a list of articles
+        if isinstance(objj, list):
+            docs = [d for i, item in enumerate(objj) if (d := item_doc(key, source, i, item))]
+        # If it's a single dict
+        elif isinstance(objj, dict):
+            docs.append(object_doc(key, source, objj))
+
+    elif ext == ".jsonl":
+        raw = safe_decode(body, content_type)
+        docs = [d for i, line in enumerate(raw.splitlines()) if (d := line_doc(key, source, i, line))]
+
+    else:
+        # Unknown type for now -> try to decode as text anyway
+        text = safe_decode(body, content_type)
+
+    if text:
+        docs.append(to_doc(key, source, None, None, text))
+    return docs, False
+
+# === STREAMING ============================================================
+
+def iter_gunzip(chunks):
+    """Decompress gzip chunk by chunk, across members (the scraper's sinks write several)."""
+    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        while chunk:
+            yield d.decompress(chunk, CHUNK_BYTES)  # capped: JSONL can inflate 100x
+            if d.eof:
+                chunk = d.unused_data
+                d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                chunk = d.unconsumed_tail
+    yield d.flush()
+
+def iter_decode(chunks, content_type: str | None = None):
+    """Decode byte chunks to text; the encoding is picked from the first SNIFF_BYTES
+    the way safe_decode picks it for the whole body."""
+    chunks = iter(chunks)
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= SNIFF_BYTES:
+            break
+    enc = bom_encoding(head[:4])
+    if not enc:
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(head[:SNIFF_BYTES])
+            enc = "utf-8"
+        except UnicodeDecodeError:
+            enc = hinted_encoding(head, content_type)
+    try:
+        dec = codecs.getincrementaldecoder(enc)(errors="replace")
+    except LookupError:
+        dec = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    yield dec.decode(head)
+    for chunk in chunks:
+        yield dec.decode(chunk)
+    yield dec.decode(b"", final=True)
+
+_client = None
+
+def stream_object(key: str, seg_path: str) -> tuple[dict | None, bool]:
+    """Stream a large JSON/JSONL object straight into its segment file, one record
+    at a time, so memory stays flat whatever the size. Runs in a worker process
+    (or inline) with its own S3 client."""
+    global _client
+    if _client is None:
+        _client = s3_client()
+    gz = key.lower().endswith(".gz")
+    ext = ext_of(key[:-3] if gz else key)
+    source = source_of(key)
+    tmp = seg_path + ".tmp"
+    ids = []
+    try:
+        resp = _client.get_object(Bucket=BUCKET, Key=key)
+        chunks = resp["Body"].iter_chunks(CHUNK_BYTES)
+        text = iter_decode(iter_gunzip(chunks) if gz else chunks, resp.get("ContentType"))
+        if ext == ".jsonl":
+            docs = (line_doc(key, source, i, line) for i, line in enumerate(jsonstream.iter_lines(text)))
+        else:
+            docs = (object_doc(key, source, item) if i is None else item_doc(key, source, i, item)
+                    for i, item in jsonstream.iter_json(text)
+                    if i is not None or isinstance(item, dict))
+        with open(tmp, "w", encoding="utf-8") as f:
+            for doc in docs:
+                if doc:
+                    f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+                    ids.append(doc["id"])
+    except (ValueError, zlib.error):
+        # same as the in-memory path: a body that does not parse is skipped whole
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return {"segment": None, "doc_ids": []}, True
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None, True
+    if not ids:
+        os.remove(tmp)
+        return {"segment": None, "doc_ids": []}, False
+    os.replace(tmp, seg_path)
+    return {"segment": seg_path, "doc_ids": ids}, False
+
+def s3_client():
+    """One client shared by all download threads, its connection pool sized to match."""
+    session = boto3.Session(profile_name=AWS_PROFILE)
+    return session.client("s3", config=Config(max_pool_connections=DOWNLOADS,
+                                              retries={"max_attempts": 5, "mode": "adaptive"}))
+
+def extract_object(s3, cpu, obj: dict) -> tuple[list[dict] | dict | None, bool]:
+    """Download on the calling thread, convert in the process pool (or inline).
+    Large JSON/JSONL objects are streamed into their segment by the worker instead,
+    and come back as {"segment", "doc_ids"}. docs is None when the object could
+    not be read, so it is retried next run."""
+    key = obj.get("Key")
+    size = obj.get("Size") or 0
+    if not key:
+        return [], False
+    gz = key.lower().endswith(".gz")
+    if size > STREAM_BYTES and ext_of(key[:-3] if gz else key) in JSON_TYPES:
+        if cpu is None:
+            return stream_object(key, segment_path(key))
+        return cpu.submit(stream_object, key, segment_path(key)).result()
+    try:
+        resp = s3.get_object(Bucket=BUCKET, Key=key)
+        body = resp["Body"].read()
+    except Exception:
+        return None, True
+    content_type = resp.get("ContentType")
+    if cpu is None:
+        return convert(key, body, content_type)
+    return cpu.submit(convert, key, body, content_type).result()
+
+# === INCREMENTAL ==========================================================
+
+def load_ledger() -> dict:
+    """key -> {etag, last_modified, size, segment, doc_ids, skipped}"""
+    if FULL or not os.path.exists(LEDGER_PATH):
+        return {}
+    with open(LEDGER_PATH, "r", encoding="utf-8") as f:
+        ledger = json.load(f)
+    if ledger.get("version") != LEDGER_VERSION:
+        return {}
+    return ledger.get("objects", {})
+
+def save_ledger(objects: dict):
+    tmp = LEDGER_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": LEDGER_VERSION, "objects": objects}, f)
+    os.replace(tmp, LEDGER_PATH)
+
+def fingerprint(obj: dict) -> dict:
+    return {"etag": obj.get("ETag"), "last_modified": obj.get("LastModified"), "size": obj.get("Size")}
+
+def unchanged(entry: dict | None, obj: dict) -> bool:
+    if not entry or {k: entry.get(k) for k in ("etag", "last_modified", "size")} != fingerprint(obj):
+        return False
+    return entry["segment"] is None or os.path.exists(entry["segment"])
+
+def segment_path(key: str) -> str:
+    return os.path.join(SEGMENT_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".jsonl")
+
+def write_segment(path: str, lines: list[str]):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    os.replace(tmp, path)
+
 # === MAIN =================================================================
 
 def main():
@@ -79,116 +359,79 @@ def main():
         print("No objects found in manifest.json -> Contents[] is empty", file=sys.stderr)
         sys.exit(1)
 
-    # S3 client using your profile
-    session = boto3.Session(profile_name=AWS_PROFILE)
-    s3 = session.client("s3")
-
     os.makedirs(os.path.dirname(OUT_PATH), exist_ok=True)
-    out = open(OUT_PATH, "w", encoding="utf-8")
-
-    kept, skipped = 0, 0
-    for obj in tqdm(items, desc="Reading S3 objects"):
-        key = obj.get("Key")
-        size = obj.get("Size") or 0
-        if not key:
-            continue
-        ext = ext_of(key)
+    os.makedirs(SEGMENT_DIR, exist_ok=True)
+    ledger = load_ledger()
+    reuse = {obj["Key"] for obj in items if obj.get("Key") and unchanged(ledger.get(obj["Key"]), obj)}
+    print(f"{len(reuse)} objects unchanged, {len(items) - len(reuse)} to read")
 
-        # Skip huge files in the first pass
-        if size and size > MAX_BYTES:
-            skipped += 1
-            continue
+    s3 = s3_client()
+    cpu = (ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context("spawn"))
+           if WORKERS and len(reuse) < len(items) else None)
 
-        try:
-            body = s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
-        except Exception as e:
-            skipped += 1
-            continue
-
-        text = ""
-        title = None
-        url = None
-        source = key.split("/")[0] if "/" in key else "bucket"
-
-        # Handle by type
-        if ext in TEXT_TYPES:
-            text = safe_decode(body)
-
-        elif ext in HTML_TYPES:
-            html = safe_decode(body)
-            text = html_to_text(html)
-
-        elif ext == ".json":
-            raw = safe_decode(body)
-            try:
-                objj = json.loads(raw)
-            except Exception:
-                skipped += 1
-                continue
-
-            # If it's a list of articles
-            if isinstance(objj, list):
-                for i, item in enumerate(objj):
-                    if not isinstance(item, dict):
-                        continue
-                    t = pick(item, TEXT_FIELDS)
-                    if not t:
-                        continue
-                    ti = pick(item, TITLE_FIELDS)
-                    u = pick(item, URL_FIELDS)
-                    rid = f"{key}:{i}"
-                    doc = to_doc(rid, source, ti, u, str(t))
-                    out.write(json.dumps(doc, ensure_ascii=False) + "\n")
-                    kept += 1
-                continue
-            # If it's a single dict
-            elif isinstance(objj, dict):
-                t = pick(objj, TEXT_FIELDS) or ""
-                ti = pick(objj, TITLE_FIELDS)
-                u = pick(objj, URL_FIELDS)
-                if t:
-                    doc = to_doc(key, source, ti, u, str(t))
-                    out.write(json.dumps(doc, ensure_ascii=False) + "\n")
-                    kept += 1
-                else:
-                    # if no obvious text field, just store the whole json minified as text
-                    doc = to_doc(key, source, ti, u, json.dumps(objj, ensure_ascii=False))
-                    out.write(json.dumps(doc, ensure_ascii=False) + "\n")
-                    kept += 1
-
-        elif ext == ".jsonl":
-            raw = safe_decode(body)
-            for i, line in enumerate(raw.splitlines()):
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    rec = json.loads(line)
-                except Exception:
-                    continue
-                t = pick(rec, TEXT_FIELDS) or ""
-                ti = pick(rec, TITLE_FIELDS)
-                u = pick(rec, URL_FIELDS)
-                if not t:
-                    # fallback: keep minified record text
-                    t = json.dumps(rec, ensure_ascii=False)
-                rid = f"{key}:{i}"
-                doc = to_doc(rid, source, ti, u, str(t))
-                out.write(json.dumps(doc, ensure_ascii=False) + "\n")
-                kept += 1
+    kept, skipped = 0, 0
+    new_ledger = {}
 
+    def write(obj, result):
+        nonlocal kept, skipped
+        key = obj.get("Key")
+        if result is None:  # unchanged: replay the stored segment
+            entry = ledger[key]
+        elif isinstance(result[0], dict):  # streamed: the worker already wrote the segment
+            entry = {**fingerprint(obj), **result[0], "skipped": result[1]}
         else:
-            # Unknown type for now -> try to decode as text anyway
-            text = safe_decode(body)
+            docs, was_skipped = result
+            skipped += was_skipped
+            lines = [json.dumps(doc, ensure_ascii=False) + "\n" for doc in docs or ()]
+            out.writelines(lines)
+            kept += len(lines)
+            if key and docs is not None:
+                seg = segment_path(key) if lines else None
+                if seg:
+                    write_segment(seg, lines)
+                new_ledger[key] = {**fingerprint(obj), "segment": seg, "skipped": was_skipped,
+                                   "doc_ids": [doc["id"] for doc in docs]}
+            bar.update()
+            return
+        skipped += entry["skipped"]
+        if entry["segment"]:
+            with open(entry["segment"], "r", encoding="utf-8") as seg:
+                for line in seg:
+                    out.write(line)
+        kept += len(entry["doc_ids"])
+        new_ledger[key] = entry
+        bar.update()
 
-        if text and ext not in (".json", ".jsonl"):
-            doc = to_doc(key, source, None, None, text)
-            out.write(json.dumps(doc, ensure_ascii=False) + "\n")
-            kept += 1
+    # downloads and conversions run ahead in a bounded window; this thread is
+    # the only writer and takes results in manifest order, so output is stable
+    tmp_out = OUT_PATH + ".tmp"
+    try:
+        with open(tmp_out, "w", encoding="utf-8") as out, \
+                tqdm(total=len(items), desc="Reading S3 objects") as bar, \
+                ThreadPoolExecutor(max_workers=DOWNLOADS) as pool:
+            window = deque()
+            for obj in items:
+                fut = None if obj.get("Key") in reuse else pool.submit(extract_object, s3, cpu, obj)
+                window.append((obj, fut))
+                if len(window) >= WINDOW:
+                    o, fut = window.popleft()
+                    write(o, fut and fut.result())
+            while window:
+                o, fut = window.popleft()
+                write(o, fut and fut.result())
+    finally:
+        if cpu:
+            cpu.shutdown()
+    os.replace(tmp_out, OUT_PATH)
+
+    # segments of objects that left the manifest or stopped producing docs
+    live = {e["segment"] for e in new_ledger.values() if e["segment"]}
+    for entry in ledger.values():
+        if entry["segment"] and entry["segment"] not in live and os.path.exists(entry["segment"]):
+            os.remove(entry["segment"])
+    save_ledger(new_ledger)
 
-    out.close()
     print(f"Saved {kept} docs to {OUT_PATH}; skipped {skipped} objects")
 
 if __name__ == "__main__":
     main()
-
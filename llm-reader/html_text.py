@@ -0,0 +1,149 @@
+"""Single-pass HTML → markdown-ish text, close to what html2text produced for us
+(ignore_images, inline links, no wrapping) but without building a tree."""
+import re
+
+from lxml import etree
+
+SKIP = {"script", "style", "noscript", "template", "head", "svg", "iframe", "object", "select", "button"}
+BOILERPLATE = {"nav", "footer", "aside"}  # site chrome repeated on every page
+BLOCK = {"p", "div", "section", "article", "main", "header", "form", "fieldset", "figure", "figcaption",
+         "address", "details", "summary", "dl", "dt", "dd", "ul", "ol", "table", "caption", "center"}
+HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+EMPHASIS = {"b": "**", "strong": "**", "i": "_", "em": "_", "code": "`", "kbd": "`", "tt": "`"}
+_WS = re.compile(r"\s+")
+
+class _TextTarget:
+    """lxml parser target; keeps a list of finished blocks and the current line."""
+
+    def __init__(self, strip_boilerplate: bool):
+        self.drop = SKIP | BOILERPLATE if strip_boilerplate else SKIP
+        self.blocks = []    # (text, tight): tight blocks (list items, rows) join with one newline
+        self.line = []      # inline pieces of the block being built
+        self.flushes = 0    # bumps on each flush so open inline marks know if their start is gone
+        self.marks = []     # (tag, flushes, position in line, href)
+        self.prefix = ""
+        self.lists = []     # [tag, item count] per open ul/ol
+        self.skip = 0
+        self.pre = 0
+        self.cells = 0
+
+    def _flush(self, tight: bool = False):
+        self.flushes += 1
+        if not self.line:
+            return
+        raw = "".join(self.line)
+        self.line = []
+        if self.pre:
+            text = "\n".join("    " + l for l in raw.strip("\n").split("\n"))
+        else:
+            lines = (_WS.sub(" ", l).strip() for l in raw.split("\n"))
+            text = "  \n".join(l for l in lines if l)
+            if not text:
+                return
+            text = self.prefix + text
+        self.blocks.append((text, tight))
+
+    def start(self, tag, attrib):
+        if self.skip or tag in self.drop:
+            self.skip += 1
+            return
+        if tag in HEADINGS:
+            self._flush()
+            self.prefix = "#" * HEADINGS[tag] + " "
+        elif tag == "li":
+            self._flush(bool(self.lists))
+            depth = max(len(self.lists), 1)
+            if self.lists and self.lists[-1][0] == "ol":
+                self.lists[-1][1] += 1
+                bullet = f"{self.lists[-1][1]}. "
+            else:
+                bullet = "* "
+            self.prefix = "  " * depth + bullet
+        elif tag in ("ul", "ol"):
+            self._flush(bool(self.lists))
+            self.lists.append([tag, 0])
+        elif tag == "tr":
+            self._flush(True)
+            self.cells = 0
+        elif tag in ("td", "th"):
+            if self.cells:
+                self.line.append(" | ")
+            self.cells += 1
+        elif tag == "br":
+            self.line.append("\n")
+        elif tag == "hr":
+            self._flush()
+            self.blocks.append(("* * *", False))
+        elif tag == "pre":
+            self._flush()
+            self.pre += 1
+        elif tag == "blockquote":
+            self._flush()
+            self.prefix = "> "
+        elif tag in BLOCK:
+            self._flush()
+        elif tag == "a":
+            href = (attrib.get("href") or "").strip()
+            if href and not href.startswith(("#", "javascript:")):
+                self.marks.append(("a", self.flushes, len(self.line), href))
+        elif tag in EMPHASIS and not self.pre:
+            self.marks.append((tag, self.flushes, len(self.line), None))
+
+    def end(self, tag):
+        if self.skip:
+            self.skip -= 1
+            return
+        if tag in HEADINGS or tag == "blockquote":
+            self._flush()
+            self.prefix = ""
+        elif tag == "li":
+            self._flush(True)
+            self.prefix = ""
+        elif tag in ("ul", "ol"):
+            self._flush(True)
+            if self.lists:
+                self.lists.pop()
+        elif tag == "tr":
+            self._flush(True)
+        elif tag == "pre":
+            self._flush()
+            self.pre -= 1
+        elif tag in BLOCK:
+            self._flush()
+        elif self.marks and self.marks[-1][0] == tag:
+            _, flushes, pos, href = self.marks.pop()
+            if flushes != self.flushes:
+                return  # a block boundary fell inside; leave the text plain
+            inner = _WS.sub(" ", "".join(self.line[pos:])).strip()
+            del self.line[pos:]
+            if not inner:
+                return
+            if href is None:
+                self.line.append(f"{EMPHASIS[tag]}{inner}{EMPHASIS[tag]}")
+            elif inner == href:
+                self.line.append(f"<{href}>")
+            else:
+                self.line.append(f"[{inner}]({href})")
+
+    def data(self, text):
+        if not self.skip:
+            self.line.append(text)
+
+    def close(self):
+        self._flush()
+        out = []
+        for i, (text, tight) in enumerate(self.blocks):
+            if i:
+                out.append("\n" if tight and self.blocks[i - 1][1] else "\n\n")
+            out.append(text)
+        return "".join(out) + "\n"
+
+def html_to_text(html: str, strip_boilerplate: bool = True) -> str:
+    """Readable markdown-ish text: headings, lists, links and emphasis kept;
+    scripts, styles, images and (by default) nav/footer/aside dropped."""
+    parser = etree.HTMLParser(target=_TextTarget(strip_boilerplate), no_network=True)
+    try:
+        parser.feed(html)
+        return parser.close()
+    except etree.LxmlError:
+        return ""
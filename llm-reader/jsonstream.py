@@ -0,0 +1,109 @@
+"""Incremental JSON / JSONL parsing over an iterator of str chunks, so large
+objects can be read without holding the whole body in memory."""
+import json, re
+from typing import Iterable, Iterator
+
+_WS = re.compile(r"[ \t\n\r]*")
+_NUM_TAIL = re.compile(r"[0-9+\-.eE]*")  # what could still follow a number cut at a chunk edge
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Same lines as "".join(chunks).splitlines(), without joining the chunks."""
+    tail = []  # pieces of the line that has not ended yet; only each new chunk is split
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if tail and tail[-1].endswith("\r"):
+            # a "\r" is held back in case its "\n" starts the next chunk
+            yield "".join(tail)[:-1]
+            tail = []
+            if chunk.startswith("\n"):
+                chunk = chunk[1:]
+        lines = chunk.splitlines(keepends=True)
+        for n, line in enumerate(lines):
+            text = line.splitlines()[0]
+            if n == len(lines) - 1 and (text == line or line.endswith("\r")):
+                tail.append(line)  # unterminated, or a "\r" that may be half of "\r\n"
+                break
+            if tail:
+                text = "".join(tail) + text
+                tail = []
+            yield text
+    if tail:
+        yield from "".join(tail).splitlines()
+
+class _Reader:
+    def __init__(self, chunks: Iterable[str]):
+        self.it = iter(chunks)
+        self.buf, self.pos = "", 0
+
+    def more(self, double: bool = False) -> bool:
+        """Append the next chunk to the unconsumed text, or with double, chunks until
+        that text has doubled, joined once. False at the end of input."""
+        parts = [self.buf[self.pos:]]  # drop what has been consumed
+        size = want = len(parts[0])
+        for chunk in self.it:
+            parts.append(chunk)
+            size += len(chunk)
+            if not double or size >= 2 * want:
+                break
+        if len(parts) == 1:
+            return False
+        self.buf = "".join(parts)
+        self.pos = 0
+        return True
+
+    def skip_ws(self) -> str:
+        """Next non-whitespace char (not consumed), or "" at the end of input."""
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.more():
+                return ""
+
+    def rest(self) -> str:
+        parts = [self.buf[self.pos:]]
+        parts.extend(self.it)
+        return "".join(parts)
+
+def iter_json(chunks: Iterable[str]) -> Iterator[tuple]:
+    """Yield (i, item) for each item of a top-level JSON array, parsed one at a time.
+
+    Any other top-level value is parsed whole and yielded once as (None, value).
+    Raises ValueError on malformed or truncated input.
+    """
+    decoder = json.JSONDecoder()
+    r = _Reader(chunks)
+    if r.skip_ws() != "[":
+        yield None, json.loads(r.rest())
+        return
+    r.pos += 1
+    if r.skip_ws() == "]":
+        r.pos += 1
+    else:
+        i = 0
+        while True:
+            if not r.skip_ws():
+                raise ValueError("truncated JSON array")
+            try:
+                value, end = decoder.raw_decode(r.buf, r.pos)
+            except json.JSONDecodeError:
+                # the item runs past the buffer: decode again once it has doubled, not after every chunk
+                if r.more(double=True):
+                    continue
+                raise
+            if (type(value) in (int, float) and _NUM_TAIL.fullmatch(r.buf, end) and r.more()):
+                continue  # a number may be cut at the chunk edge; parse it again with more text
+            yield i, value
+            i += 1
+            r.pos = end
+            c = r.skip_ws()
+            if c == ",":
+                r.pos += 1
+            elif c == "]":
+                r.pos += 1
+                break
+            else:
+                raise ValueError(f"expected ',' or ']' in JSON array, got {c!r}")
+    if r.skip_ws():
+        raise ValueError("extra data after JSON array")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Chunk metadata store: one JSON record per FAISS id, looked up through mmap.
+
+Layout of data/meta.store (all integers little-endian uint64):
+
+  records   UTF-8 JSON of each chunk, back to back; a removed id is an empty record
+  offsets   count + 1 entries: where each record starts, then where the records end
+  footer    count, then the 8-byte MAGIC
+
+The offset table is fixed-width, so store[i] reads two offsets and one record
+and nothing else; a query for the top k touches k records. The table sits at
+the end so the builder can write records as it goes.
+
+Usage: python metastore.py export data/meta.store [data/meta.json]   (stdout if no output path)
+"""
+import os, sys, json, mmap, struct
+from array import array
+
+import jsonstream
+
+MAGIC = b"TIMETA01"
+_FOOTER = struct.Struct("<Q8s")
+_SPAN = struct.Struct("<QQ")
+READ_BYTES = 1024 * 1024  # read size when streaming a legacy meta.json
+
+class StoreWriter:
+    """Writes records one batch at a time to path + ".tmp"; the caller renames it."""
+
+    def __init__(self, path: str):
+        self.tmp = path + ".tmp"
+        self.f = open(self.tmp, "wb")
+        self.offsets = array("Q", [0])  # 8 bytes per id, not a Python int each
+        self.count = 0
+
+    def write(self, items: list[dict | None]):
+        for it in items:
+            if it is not None:
+                self.f.write(json.dumps(it, ensure_ascii=False).encode("utf-8"))
+            self.offsets.append(self.f.tell())
+            self.count += 1
+
+    def close(self):
+        if sys.byteorder == "big":
+            self.offsets.byteswap()
+        self.f.write(self.offsets.tobytes())
+        self.f.write(_FOOTER.pack(self.count, MAGIC))
+        self.f.close()
+
+    def abort(self):
+        self.f.close()
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+class MetaStore:
+    """Read-only view of a meta.store; store[i] is the record of FAISS id i (None if removed)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < _FOOTER.size:
+            raise ValueError(f"{path}: too short for a meta store")
+        self.count, magic = _FOOTER.unpack_from(self.mm, len(self.mm) - _FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a meta store")
+        self.table = len(self.mm) - _FOOTER.size - 8 * (self.count + 1)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i: int) -> dict | None:
+        i = int(i)
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        start, end = _SPAN.unpack_from(self.mm, self.table + 8 * i)
+        return json.loads(self.mm[start:end]) if end > start else None
+
+    def get_many(self, ids) -> list[dict | None]:
+        return [self[i] for i in ids]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def close(self):
+        self.mm.close()
+
+def is_store(path: str) -> bool:
+    """True if path ends with the meta store footer; the extension says nothing (--meta x.json)."""
+    with open(path, "rb") as f:
+        if f.seek(0, os.SEEK_END) < _FOOTER.size:
+            return False
+        f.seek(-len(MAGIC), os.SEEK_END)
+        return f.read() == MAGIC
+
+def open_meta(path: str):
+    """A MetaStore, or for a legacy meta.json the parsed list (same indexing)."""
+    if not is_store(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return MetaStore(path)
+
+def iter_items(path: str):
+    """(id, record) for every slot, streamed from a meta.store or a legacy meta.json."""
+    if not is_store(path):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from jsonstream.iter_json(iter(lambda: f.read(READ_BYTES), ""))
+        return
+    store = MetaStore(path)
+    try:
+        yield from enumerate(store)
+    finally:
+        store.close()
+
+def export_json(path: str, out):
+    """Write the records as a JSON array (removed ids as null), one record in memory at a time."""
+    out.write("[")
+    for i, item in iter_items(path):
+        out.write(("," if i else "") + json.dumps(item, ensure_ascii=False))
+    out.write("]\n")
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != "export":
+        raise SystemExit(__doc__.strip().splitlines()[-1])
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], "w", encoding="utf-8") as out:
+            export_json(sys.argv[2], out)
+    else:
+        export_json(sys.argv[2], sys.stdout)
+
+if __name__ == "__main__":
+    main()
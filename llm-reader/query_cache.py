@@ -0,0 +1,183 @@
+"""Two-level cache for repeated searches, keyed on the index version (ann.index_version).
+
+  embeddings  LRU of normalized query text -> query vector, so a repeated query
+              never reaches the embedder (for OpenAI: no API call). Persisted to
+              data/query_cache/<index>/<version>-<model>.log, so a restart starts warm.
+  results     (query, k, filters) -> top-k ids, kept for QUERY_RESULT_TTL seconds.
+
+A rebuilt index has a new version: the in-memory levels start empty and log
+files of other versions are deleted when the cache is opened.
+
+The log is append-only; each record is a uint32 text length, a uint32 dim,
+the UTF-8 query and dim float32s. Replaying it keeps the newest entries, and
+once it holds twice as many records as the LRU it is rewritten with the LRU.
+"""
+import os, re, json, time, struct, threading, unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+import ann
+
+CACHE_DIR = os.getenv("QUERY_CACHE_DIR", "data/query_cache")
+EMBED_ENTRIES = int(os.getenv("QUERY_CACHE_SIZE", "10000"))
+RESULT_ENTRIES = 10000
+RESULT_TTL = float(os.getenv("QUERY_RESULT_TTL", "300"))
+_RECORD = struct.Struct("<II")
+
+def normalize_query(q: str) -> str:
+    """'  Log4J  exploit ' and 'log4j exploit' are the same search."""
+    return " ".join(unicodedata.normalize("NFKC", q).casefold().split())
+
+class EmbeddingLRU:
+    def __init__(self, path: str | None, max_entries: int = EMBED_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.lru = OrderedDict()  # normalized query -> float32 vector
+        self.lock = threading.Lock()
+        self.records = 0
+        self.hits = self.misses = 0
+        if path and os.path.exists(path):
+            self._replay()
+
+    def _replay(self):
+        good = 0
+        with open(self.path, "rb") as f:
+            data = f.read()
+        pos = 0
+        while pos + _RECORD.size <= len(data):
+            n, dim = _RECORD.unpack_from(data, pos)
+            end = pos + _RECORD.size + n + 4 * dim
+            if end > len(data):
+                break
+            q = data[pos + _RECORD.size:pos + _RECORD.size + n].decode("utf-8")
+            self._remember(q, np.frombuffer(data, np.float32, dim, pos + _RECORD.size + n).copy())
+            pos = good = end
+            self.records += 1
+        if good < len(data):  # a write cut short by a crash
+            with open(self.path, "ab") as f:
+                f.truncate(good)
+        if self.records > 2 * self.max_entries:
+            self._compact()
+
+    def _remember(self, q: str, v: np.ndarray):
+        self.lru[q] = v
+        self.lru.move_to_end(q)
+        if len(self.lru) > self.max_entries:
+            self.lru.popitem(last=False)
+
+    def _compact(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            for q, v in self.lru.items():
+                f.write(_pack(q, v))
+        os.replace(tmp, self.path)
+        self.records = len(self.lru)
+
+    def get(self, q: str) -> np.ndarray | None:
+        with self.lock:
+            v = self.lru.get(q)
+            if v is None:
+                self.misses += 1
+                return None
+            self.lru.move_to_end(q)
+            self.hits += 1
+            return v
+
+    def put(self, q: str, v: np.ndarray):
+        v = np.ascontiguousarray(v, dtype=np.float32).ravel()
+        with self.lock:
+            if q in self.lru:
+                return
+            self._remember(q, v)
+            if not self.path:
+                return
+            with open(self.path, "ab") as f:
+                f.write(_pack(q, v))
+            self.records += 1
+            if self.records > 2 * self.max_entries:
+                self._compact()
+
+def _pack(q: str, v: np.ndarray) -> bytes:
+    b = q.encode("utf-8")
+    return _RECORD.pack(len(b), len(v)) + b + v.tobytes()
+
+class ResultCache:
+    """(query, k, filters) -> top-k ids; entries expire after ttl seconds."""
+
+    def __init__(self, ttl: float = RESULT_TTL, max_entries: int = RESULT_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires, ids)
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def key(q: str, k: int, filters: dict | None = None) -> tuple:
+        return q, k, json.dumps(filters, sort_keys=True) if filters else ""
+
+    def get(self, key: tuple) -> list[int] | None:
+        with self.lock:
+            hit = self.entries.get(key)
+            if hit is None or hit[0] < time.monotonic():
+                if hit is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return hit[1]
+
+    def put(self, key: tuple, ids: list[int]):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, ids)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+class QueryCache:
+    """Both levels for the current version of index_path and one query model."""
+
+    def __init__(self, index_path: str, model: str, root: str | None = CACHE_DIR):
+        self.version = ann.index_version(index_path)
+        path = None
+        if root:
+            d = os.path.join(root, os.path.splitext(os.path.basename(index_path))[0])
+            os.makedirs(d, exist_ok=True)
+            for old in os.listdir(d):
+                if old.endswith(".log") and not old.startswith(self.version + "-"):
+                    os.remove(os.path.join(d, old))  # written for an index that has been rebuilt
+            path = os.path.join(d, self.version + "-" + re.sub(r"[^\w.-]+", "_", model) + ".log")
+        self.embeddings = EmbeddingLRU(path)
+        self.results = ResultCache()
+
+    def embedder(self, model):
+        return CachedQueryEmbedder(model, self.embeddings)
+
+    def stats(self) -> dict:
+        return {"version": self.version,
+                "embeddings": {"entries": len(self.embeddings.lru), "hits": self.embeddings.hits,
+                               "misses": self.embeddings.misses},
+                "results": {"entries": len(self.results.entries), "hits": self.results.hits,
+                            "misses": self.results.misses}}
+
+class CachedQueryEmbedder:
+    """Wraps a query model so only queries missing from the LRU reach it."""
+
+    def __init__(self, model, lru: EmbeddingLRU):
+        self.model = model
+        self.lru = lru
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        keys = [normalize_query(t) for t in texts]
+        vecs = {k: self.lru.get(k) for k in keys}
+        miss = [k for k, v in vecs.items() if v is None]
+        if miss:
+            # the normalized text is embedded, so every spelling of a query gets the same vector
+            fresh = np.array(list(self.model.embed(miss)), dtype=np.float32).reshape(len(miss), -1)
+            for k, v in zip(miss, fresh):
+                self.lru.put(k, v)
+                vecs[k] = v
+        return np.stack([vecs[k] for k in keys])
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Resident retrieval service for the API server.
+
+The embedding model, FAISS index and meta store are loaded once (ask_fast.load)
+and kept warm; the Node routes ask over local HTTP instead of starting a Python
+interpreter per request.
+
+  GET  /healthz   200 while the process is up
+  GET  /readyz    200 once model, index and meta are loaded; 503 before, or if loading failed
+  POST /search    {"q": "...", "k": 5}  ->  {"items": [chunk, ...], "took_ms": 12.3}
+                  optional "filters": {"category": "government", "days": 7, ...} (see attrstore.py)
+
+Errors come back as {"error": "..."} with a 4xx/5xx status.
+
+Concurrent searches are micro-batched (batcher.py): queries arriving within
+--max-wait-ms are embedded and searched together, up to --max-batch at a time.
+--max-batch 1 turns batching off.
+
+Usage: python retrieval_server.py [--host 127.0.0.1] [--port 8765] [--socket /run/retrieval.sock]
+                                  [--max-batch 32] [--max-wait-ms 5]
+       (or RETRIEVAL_HOST / RETRIEVAL_PORT / RETRIEVAL_SOCKET / RETRIEVAL_MAX_BATCH / RETRIEVAL_MAX_WAIT_MS)
+"""
+import argparse, json, os, socketserver, threading, time, traceback
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import ask_fast
+from batcher import QueryBatcher
+
+MAX_K = 50
+MAX_BODY = 64 * 1024
+
+class Retriever:
+    """Loads in the background so /healthz answers during warm-up."""
+
+    def __init__(self, max_batch: int = 1, max_wait_ms: float = 0.0):
+        self.max_batch, self.max_wait_ms = max_batch, max_wait_ms
+        self.batcher = None
+        self.model = self.index = self.meta = None
+        self.error = None
+        self.ready = threading.Event()
+        self.loaded_at = None
+
+    def load(self):
+        t0 = time.perf_counter()
+        try:
+            self.attach(*ask_fast.load())
+            ask_fast.embed_query(self.model, "warm up")  # first call initializes the runtime
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+            return
+        self.ready.set()
+        print(f"[retrieval] ready in {time.perf_counter() - t0:.1f}s: {self.index.ntotal} vectors, "
+              f"dim {self.index.d}, {len(self.meta)} meta records", flush=True)
+
+    def attach(self, model, index, meta):
+        """Serve from an already loaded model, index and meta store."""
+        self.model, self.index, self.meta = model, index, meta
+        if self.max_batch > 1:
+            self.batcher = QueryBatcher(model, index, meta, self.max_batch, self.max_wait_ms)
+        self.loaded_at = time.time()
+
+    def status(self) -> dict:
+        if self.ready.is_set():
+            st = {"ready": True, "vectors": self.index.ntotal, "dim": self.index.d,
+                  "index": ask_fast.INDEX_PATH, "loaded_at": self.loaded_at}
+            if self.batcher:
+                b = self.batcher
+                st["batching"] = {"max_batch": b.max_batch, "max_wait_ms": self.max_wait_ms, "batches": b.batches,
+                                  "avg_batch": round(b.queries / b.batches, 2) if b.batches else 0.0}
+            if ask_fast.CACHE:
+                st["cache"] = ask_fast.CACHE.stats()
+            return st
+        return {"ready": False, "error": self.error}
+
+    def search(self, q: str, k: int, filters: dict | None = None) -> list[dict]:
+        if self.batcher and not ask_fast.lexical_only(q):  # identifier lookups need not wait for a batch
+            return self.batcher.search(q, k, filters)
+        return ask_fast.retrieve(self.model, self.index, self.meta, q, k, filters)
+
+def make_handler(retriever: Retriever):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, obj: dict):
+            body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/healthz":
+                return self._send(200, {"ok": True})
+            if path == "/readyz":
+                st = retriever.status()
+                return self._send(200 if st["ready"] else 503, st)
+            self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.split("?", 1)[0] != "/search":
+                return self._send(404, {"error": "not found"})
+            try:
+                n = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                n = -1
+            if not 0 <= n <= MAX_BODY:
+                self.close_connection = True  # the body was not read, so the stream is out of step
+                if n > MAX_BODY:
+                    return self._send(413, {"error": "request too large"})
+                return self._send(400, {"error": "bad Content-Length"})
+            try:
+                req = json.loads(self.rfile.read(n) or b"{}")
+                q = str(req.get("q") or "").strip()
+                k = max(1, min(MAX_K, int(req.get("k") or 5)))
+            except (ValueError, TypeError, AttributeError, OverflowError):
+                return self._send(400, {"error": "expected JSON {\"q\": string, \"k\": int, \"filters\": object}"})
+            if not q:
+                return self._send(400, {"error": "missing q"})
+            if not retriever.ready.is_set():
+                return self._send(503, {"error": retriever.error or "index still loading"})
+            try:
+                filters = ask_fast.resolve_filters(req.get("filters"))
+            except ValueError as e:
+                return self._send(400, {"error": f"filters: {e}"})
+            t0 = time.perf_counter()
+            try:
+                items = retriever.search(q, k, filters)
+            except Exception as e:
+                traceback.print_exc()
+                return self._send(500, {"error": f"{type(e).__name__}: {e}"})
+            self._send(200, {"items": items, "took_ms": round((time.perf_counter() - t0) * 1000, 2)})
+
+    return Handler
+
+LISTEN_BACKLOG = 128  # the socketserver default of 5 drops connects under a burst of clients
+
+class TCPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def get_request(self):
+        sock, _ = super().get_request()
+        return sock, ("unix", 0)  # BaseHTTPRequestHandler expects a (host, port) address
+
+def serve(retriever: Retriever, host: str, port: int, socket_path: str | None = None):
+    handler = make_handler(retriever)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, handler)
+        where = socket_path
+    else:
+        server = TCPHTTPServer((host, port), handler)
+        where = f"http://{host}:{port}"
+    return server, where
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default=os.getenv("RETRIEVAL_HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("RETRIEVAL_PORT", "8765")))
+    ap.add_argument("--socket", default=os.getenv("RETRIEVAL_SOCKET") or None, help="listen on a Unix socket instead")
+    ap.add_argument("--max-batch", type=int, default=int(os.getenv("RETRIEVAL_MAX_BATCH", "32")))
+    ap.add_argument("--max-wait-ms", type=float, default=float(os.getenv("RETRIEVAL_MAX_WAIT_MS", "5")))
+    args = ap.parse_args()
+
+    retriever = Retriever(args.max_batch, args.max_wait_ms)
+    server, where = serve(retriever, args.host, args.port, args.socket)
+    threading.Thread(target=retriever.load, daemon=True).start()
+    print(f"[retrieval] listening on {where}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+if __name__ == "__main__":
+    main()
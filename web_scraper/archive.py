@@ -0,0 +1,55 @@
+import gzip, os, threading
+
+try:
+    import zstandard
+except ImportError:  # gzip still works, just bigger and slower
+    zstandard = None
+
+class BlobStore:
+    """Raw response bodies keyed by their sha256, compressed and stored once.
+
+    Layout is root/ab/cd/<sha256>.zst (.gz without the zstandard package), so the
+    same page fetched by several sites or runs takes disk space once.
+    """
+
+    def __init__(self, root: str, level: int = 6):
+        self.root, self.level = root, level
+        self.ext = ".zst" if zstandard else ".gz"
+
+    def _base(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def path(self, sha256: str) -> str | None:
+        base = self._base(sha256)
+        for ext in (".zst", ".gz"):
+            if os.path.exists(base + ext):
+                return base + ext
+        return None
+
+    def put(self, sha256: str, body: bytes) -> bool:
+        """Store a body; returns False if it was already there."""
+        if self.path(sha256):
+            return False
+        path = self._base(sha256) + self.ext
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if zstandard:
+            data = zstandard.ZstdCompressor(level=self.level).compress(body)
+        else:
+            data = gzip.compress(body, compresslevel=self.level)
+        tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # concurrent writers of the same blob write identical bytes
+        return True
+
+    def get(self, sha256: str) -> bytes | None:
+        path = self.path(sha256)
+        if not path:
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        if path.endswith(".zst"):
+            if not zstandard:
+                raise RuntimeError(f"{path} needs the zstandard package")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
@@ -0,0 +1,114 @@
+"""Offline crawl throughput benchmark against bench_server.
+
+Usage: python bench_crawl.py [--sites 3] [--host-concurrency 4] [--analyze-workers 0] [server options]
+
+Each site is its own loopback host (127.0.0.1, 127.0.0.2, ...) on one local
+server, so per-host limits behave as in a real crawl. Reports pages/sec, time
+spent per stage, extract_signals throughput and peak RSS; nothing leaves the box.
+"""
+import argparse, multiprocessing, os, resource, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import bench_server
+
+class StageTimes:
+    """Busy time and call count per stage, summed over all threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {}  # stage -> [seconds, calls]
+
+    def wrap(self, stage: str, fn):
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                dt = time.perf_counter() - t0
+                with self._lock:
+                    t = self.totals.setdefault(stage, [0.0, 0])
+                    t[0] += dt
+                    t[1] += 1
+        return timed
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux; children covers the analyzer processes
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return (own + kids) / 1024
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sites", type=int, default=3)
+    ap.add_argument("--pages-per-site", type=int, default=200)
+    ap.add_argument("--site-concurrency", type=int, default=3)
+    ap.add_argument("--host-concurrency", type=int, default=4)
+    ap.add_argument("--host-delay", type=float, default=0.0)
+    ap.add_argument("--latency-factor", type=float, default=0.0)
+    ap.add_argument("--max-connections", type=int, default=32)
+    ap.add_argument("--analyze-workers", type=int, default=0)
+    ap.add_argument("--signals-sample", type=int, default=50, help="pages for the extract_signals-only pass")
+    bench_server.add_args(ap)
+    opts = ap.parse_args()
+
+    out_dir = tempfile.mkdtemp(prefix="bench_crawl_")
+    # scraper reads its settings at import time; keep every side store off for the run
+    os.environ.update({
+        "HOST_CONCURRENCY": str(opts.host_concurrency), "HOST_DELAY": str(opts.host_delay),
+        "LATENCY_FACTOR": str(opts.latency_factor), "MAX_CONNECTIONS": str(opts.max_connections),
+        "ANALYZE_WORKERS": str(opts.analyze_workers), "SINK_BACKEND": "local", "SINK_DIR": out_dir,
+        "CRAWL_STATE_PATH": "", "CHECKPOINT_DIR": "", "ROBOTS_CACHE_PATH": "", "ARCHIVE_DIR": "",
+    })
+    import scraper
+    scraper.PAGES_PER_SITE = opts.pages_per_site
+
+    server = bench_server.serve(opts)
+    port = server.server_port
+    sites = [{"name": f"bench{i}", "category": "bench", "seeds": [f"http://127.0.0.{i + 1}:{port}/"]}
+             for i in range(opts.sites)]
+
+    stages = StageTimes()
+    scraper.fetch = stages.wrap("fetch", scraper.fetch)
+    if not opts.analyze_workers:  # in pipeline mode analysis runs in other processes
+        scraper.analyze_page = stages.wrap("analyze", scraper.analyze_page)
+    open_sink = scraper.open_sink
+    def timed_sink(key, resume=None):
+        sink = open_sink(key, resume)
+        sink.write = stages.wrap("sink", sink.write)
+        return sink
+    scraper.open_sink = timed_sink
+
+    analyzer = (ProcessPoolExecutor(opts.analyze_workers, mp_context=multiprocessing.get_context("spawn"))
+                if opts.analyze_workers else None)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=opts.site_concurrency) as pool:
+        pages = sum(pool.map(lambda s: scraper.crawl_and_upload(s, None, analyzer), sites))
+    wall = time.perf_counter() - t0
+    if analyzer:
+        analyzer.shutdown()
+    totals = {k: tuple(v) for k, v in stages.totals.items()}
+
+    base = sites[0]["seeds"][0]
+    recs = [scraper.fetch(f"{base}p/{i}") for i in range(opts.signals_sample)] if not opts.corpus else []
+    t1 = time.perf_counter()
+    for rec in recs:
+        scraper.extract_signals(rec)
+    sig_s = time.perf_counter() - t1
+
+    print(f"sites: {opts.sites}  pages: {pages}  wall: {wall:.2f}s  → {pages / wall:.1f} pages/s")
+    for stage, (secs, calls) in sorted(totals.items()):
+        print(f"  {stage:<8} {secs:8.2f}s busy  {calls:6d} calls  {secs / max(calls, 1) * 1000:8.2f} ms/call")
+    # per-analyzer split, reported by the workers too in pipeline mode
+    split = {}
+    for h in scraper.metrics.to_json()["histograms"]:
+        if h["name"] == "analyze_seconds":
+            split[h["labels"]["stage"]] = split.get(h["labels"]["stage"], 0.0) + h["sum"]
+    for name, secs in sorted(split.items(), key=lambda kv: -kv[1]):
+        print(f"    {name:<14} {secs * 1000 / max(pages, 1):8.3f} ms/page")
+    if recs:
+        print(f"extract_signals: {len(recs) / sig_s:.1f} pages/s on one core ({sig_s / len(recs) * 1000:.2f} ms/page)")
+    print(f"peak RSS: {peak_rss_mb():.1f} MiB  (rows under {out_dir})")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Per-page parse cost: the old BeautifulSoup/html.parser walks vs parse_page.
+
+Usage: python bench_parse.py <dir with saved .html pages> [--repeat N]
+
+Save pages first with e.g. `curl -s https://www.usa.gov/ -o pages/usa_gov.html`.
+"""
+import argparse, glob, os, time
+
+from bs4 import BeautifulSoup
+
+from page_parser import parse_page
+
+def legacy_visit(html: str) -> dict:
+    # what extract_signals + crawl_site did before: two html.parser parses, one walk per signal
+    soup = BeautifulSoup(html, "html.parser")
+    title = (soup.title.string.strip() if soup.title and soup.title.string else "")
+    text_sample = " ".join(soup.get_text(" ").split())[:800]
+    scripts = [s.get("src", "") for s in soup.find_all("script") if s.get("src")]
+    no_alt = sum(1 for i in soup.find_all("img") if not i.get("alt"))
+    forms = []
+    for f in soup.find_all("form"):
+        inputs = f.find_all(["input","textarea","select"])
+        forms.append({"method": f.get("method"), "action": f.get("action"),
+                      "inputs": [{"name": i.get("name"), "type": i.get("type"), "autocomplete": i.get("autocomplete")}
+                                 for i in inputs]})
+    blank = 0
+    for a in soup.find_all("a", target="_blank"):
+        rel = a.get("rel") or []
+        if "noopener" not in rel and "noreferrer" not in rel:
+            blank += 1
+    hrefs = [a["href"] for a in BeautifulSoup(html, "html.parser").select("a[href]")[:20]]
+    return {"title": title, "text_sample": text_sample, "scripts": scripts, "imgs_without_alt": no_alt,
+            "blank_without_noopener": blank, "forms": forms, "hrefs": hrefs}
+
+def time_per_page(fn, pages: list[str], repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            fn(html)
+    return (time.perf_counter() - t0) / (repeat * len(pages))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pages_dir")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.pages_dir, "*.htm*")))
+    if not paths:
+        raise SystemExit(f"no .html files in {args.pages_dir}")
+    pages = [open(p, "rb").read().decode("utf-8", errors="ignore") for p in paths]
+
+    mismatched = []
+    for p, html in zip(paths, pages):
+        old, new = legacy_visit(html), parse_page(html)
+        if (old["scripts"], old["hrefs"], old["imgs_without_alt"]) != (new["scripts"], new["hrefs"], new["imgs_without_alt"]):
+            mismatched.append(os.path.basename(p))
+
+    old_s = time_per_page(legacy_visit, pages, args.repeat)
+    new_s = time_per_page(parse_page, pages, args.repeat)
+    size = sum(len(h) for h in pages) / len(pages)
+    print(f"pages: {len(pages)}  avg size: {size / 1024:.1f} KiB")
+    print(f"bs4 html.parser (2 parses): {old_s * 1000:8.2f} ms/page")
+    print(f"parse_page (lxml, 1 pass):  {new_s * 1000:8.2f} ms/page")
+    print(f"speedup: {old_s / new_s:.1f}x")
+    if mismatched:
+        print(f"scripts/links/img counts differ on {len(mismatched)} page(s): {', '.join(mismatched[:10])}")
+
+if __name__ == "__main__":
+    main()
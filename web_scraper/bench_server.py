@@ -0,0 +1,132 @@
+"""Local stand-in web server for offline scraper benchmarks.
+
+Serves either a synthetic site (default) or a recorded corpus directory, with
+configurable latency, redirect chains, Set-Cookie and CSP headers and link fan-out.
+
+Standalone: python bench_server.py --port 8900 [--corpus DIR] [--latency-ms 50] ...
+"""
+import argparse, os, random, threading, time
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler, BaseHTTPRequestHandler
+
+LOREM = ("security header policy cookie script form login password token session "
+         "analytics library version update advisory vulnerability patch release ").split()
+
+def synthetic_page(i: int, pages: int, fanout: int, page_kb: int) -> bytes:
+    rnd = random.Random(i)
+    links = "".join(f'<a href="/p/{rnd.randrange(pages)}">page</a> ' for _ in range(fanout))
+    blank = '<a href="https://example.org/" target="_blank">ext</a>'
+    words = " ".join(rnd.choice(LOREM) for _ in range(page_kb * 1024 // 8))
+    paras = "".join(f"<p>{words[j:j + 400]}</p><img src=\"/img/{j}.png\">" for j in range(0, len(words), 400))
+    return (
+        f"<!doctype html><html><head><title>Synthetic page {i}</title>"
+        f'<script src="/static/jquery-1.12.4.min.js"></script><style>p{{margin:0}}</style></head>'
+        f"<body><nav>{links}{blank}</nav>{paras}"
+        f'<form method="get" action="/login"><input name="user"><input type="password" name="pw"></form>'
+        f'<script>fetch("/api/items/{i}.json")</script></body></html>'
+    ).encode("utf-8")
+
+def make_handler(opts):
+    """Handler class bound to the parsed options (see add_args)."""
+    latency = opts.latency_ms / 1000.0
+
+    class SyntheticHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes = b"", ctype: str = "text/html; charset=utf-8", extra=()):
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in extra:
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency * random.uniform(0.5, 1.5))
+            path = self.path.split("?", 1)[0]
+            if path == "/robots.txt":
+                return self._send(200, b"User-agent: *\nAllow: /\n", "text/plain")
+            if path == "/":
+                path = "/p/0"
+            parts = path.strip("/").split("/")
+            # /p/<i> starts a redirect chain for every Nth page: /r/<hop>/<i> ... /final/<i>
+            if parts[0] == "p" and opts.redirect_every and int(parts[1]) % opts.redirect_every == 0 and int(parts[1]):
+                nxt = f"/r/1/{parts[1]}" if opts.redirect_hops > 1 else f"/final/{parts[1]}"
+                return self._send(301, extra=[("Location", nxt)])
+            if parts[0] == "r":
+                hop, i = int(parts[1]), parts[2]
+                nxt = f"/r/{hop + 1}/{i}" if hop + 1 < opts.redirect_hops else f"/final/{i}"
+                return self._send(302, extra=[("Location", nxt)])
+            if parts[0] in ("p", "final") and len(parts) == 2 and parts[1].isdigit():
+                i = int(parts[1])
+                headers = [("Set-Cookie", f"c{j}=v{i}; Path=/" + ("; Secure; HttpOnly" if j % 2 else ""))
+                           for j in range(opts.cookies)]
+                if opts.csp:
+                    headers.append(("Content-Security-Policy", opts.csp))
+                return self._send(200, synthetic_page(i % opts.pages, opts.pages, opts.fanout, opts.page_kb),
+                                  extra=headers)
+            if parts[0] == "api":
+                return self._send(200, b'{"items": []}', "application/json")
+            return self._send(404, b"not found", "text/plain")
+
+    class CorpusHandler(SimpleHTTPRequestHandler):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, directory=opts.corpus, **kw)
+
+        def log_message(self, *args):
+            pass
+
+        def end_headers(self):
+            for j in range(opts.cookies):
+                self.send_header("Set-Cookie", f"c{j}=v; Path=/")
+            if opts.csp:
+                self.send_header("Content-Security-Policy", opts.csp)
+            super().end_headers()
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency * random.uniform(0.5, 1.5))
+            super().do_GET()
+
+    return CorpusHandler if opts.corpus else SyntheticHandler
+
+def add_args(ap: argparse.ArgumentParser):
+    ap.add_argument("--corpus", help="serve saved pages from this directory instead of synthetic ones")
+    ap.add_argument("--pages", type=int, default=500, help="synthetic pages per site")
+    ap.add_argument("--fanout", type=int, default=20, help="links per synthetic page")
+    ap.add_argument("--page-kb", type=int, default=40, help="approximate synthetic page size")
+    ap.add_argument("--latency-ms", type=float, default=50, help="mean response latency")
+    ap.add_argument("--redirect-every", type=int, default=10, help="every Nth page redirects (0 = none)")
+    ap.add_argument("--redirect-hops", type=int, default=2, help="length of each redirect chain")
+    ap.add_argument("--cookies", type=int, default=3, help="Set-Cookie headers per response")
+    ap.add_argument("--csp", default="default-src 'self'; script-src 'self' 'unsafe-inline'",
+                    help="Content-Security-Policy header ('' for none)")
+
+def serve(opts, host: str = "0.0.0.0", port: int = 0) -> ThreadingHTTPServer:
+    """Start the server on a daemon thread and return it (server.server_port has the port)."""
+    if opts.corpus and not os.path.isdir(opts.corpus):
+        raise SystemExit(f"no such corpus directory: {opts.corpus}")
+    server = ThreadingHTTPServer((host, port), make_handler(opts))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8900)
+    add_args(ap)
+    opts = ap.parse_args()
+    server = serve(opts, port=opts.port)
+    print(f"serving on http://127.0.0.1:{server.server_port}/ (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
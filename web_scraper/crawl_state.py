@@ -0,0 +1,61 @@
+import json, sqlite3, threading, time
+
+class CrawlState:
+    """What earlier runs saw per canonical URL: validators, body hash, clean row and links.
+
+    Used to send conditional GETs on recrawls and to reuse the stored clean row
+    when a page answers 304 or its body hash is unchanged.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            sha256 TEXT,
+            clean_row TEXT,
+            links TEXT,
+            updated_at REAL
+        )""")
+
+    def get(self, url: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, sha256, clean_row, links FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if not row:
+            return None
+        etag, last_modified, sha256, clean_row, links = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": sha256,
+            "clean_row": json.loads(clean_row),
+            "links": json.loads(links),
+        }
+
+    def put(self, url: str, headers: dict, sha256: str, clean_row: dict, links: list[str]):
+        hdrs = {k.lower(): v for k, v in headers.items()}
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, hdrs.get("etag"), hdrs.get("last-modified"), sha256,
+                 json.dumps(clean_row, ensure_ascii=False), json.dumps(links), time.time()),
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def conditional_headers(prev: dict | None) -> dict:
+    if not prev:
+        return {}
+    h = {}
+    if prev.get("etag"):
+        h["If-None-Match"] = prev["etag"]
+    if prev.get("last_modified"):
+        h["If-Modified-Since"] = prev["last_modified"]
+    return h
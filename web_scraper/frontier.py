@@ -0,0 +1,105 @@
+import base64, hashlib, json, math, os
+from collections import deque
+
+from urls import canonical_url
+
+API_PENALTY = 1  # API endpoints found in page source wait behind links of the same depth
+
+class BloomFilter:
+    """Fixed-size seen-set for very large crawls: no false negatives, ~error_rate false positives."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, bits: bytes | None = None):
+        self.m = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.k = max(1, round(self.m / capacity * math.log(2)))
+        self.capacity, self.error_rate = capacity, error_rate
+        self._bits = bytearray(bits) if bits else bytearray((self.m + 7) // 8)
+
+    def _positions(self, key: str):
+        d = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(d[:8], "little"), int.from_bytes(d[8:], "little") | 1
+        return ((h1 + i * h2) % self.m for i in range(self.k))
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key: str):
+        for p in self._positions(key):
+            self._bits[p >> 3] |= 1 << (p & 7)
+
+    def to_dict(self) -> dict:
+        return {"capacity": self.capacity, "error_rate": self.error_rate,
+                "bits": base64.b64encode(bytes(self._bits)).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "BloomFilter":
+        return cls(d["capacity"], d["error_rate"], base64.b64decode(d["bits"]))
+
+class Frontier:
+    """Crawl queue with canonical-URL dedup at enqueue time.
+
+    One FIFO deque per priority (depth, plus API_PENALTY for API URLs), so push and
+    pop are O(1) apart from picking the lowest non-empty priority among a handful.
+    The seen-set is exact, or a BloomFilter when bloom_capacity is given.
+    """
+
+    def __init__(self, bloom_capacity: int = 0):
+        self._queues = {}  # priority -> deque of (url, depth)
+        self._seen = BloomFilter(bloom_capacity) if bloom_capacity else set()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, url: str, depth: int = 0, source: str = "link") -> bool:
+        key = canonical_url(url)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        self._enqueue(url, depth, depth + (API_PENALTY if source == "api" else 0))
+        return True
+
+    def requeue(self, url: str, depth: int):
+        """Put back a URL that was popped but never finished (e.g. in flight at a checkpoint)."""
+        self._enqueue(url, depth, depth)
+
+    def _enqueue(self, url: str, depth: int, priority: int):
+        q = self._queues.get(priority)
+        if q is None:
+            q = self._queues[priority] = deque()
+        q.append((url, depth))
+        self._size += 1
+
+    def pop(self) -> tuple[str, int]:
+        p = min(self._queues)
+        q = self._queues[p]
+        item = q.popleft()
+        if not q:
+            del self._queues[p]
+        self._size -= 1
+        return item
+
+    def to_dict(self) -> dict:
+        seen = self._seen.to_dict() if isinstance(self._seen, BloomFilter) else sorted(self._seen)
+        return {"queues": [[p, list(q)] for p, q in sorted(self._queues.items())], "seen": seen}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Frontier":
+        f = cls()
+        f._seen = BloomFilter.from_dict(d["seen"]) if isinstance(d["seen"], dict) else set(d["seen"])
+        for p, items in d["queues"]:
+            for url, depth in items:
+                f._enqueue(url, depth, p)
+        return f
+
+def save_checkpoint(path: str, data: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)  # atomic: a kill mid-write leaves the previous checkpoint intact
+
+def load_checkpoint(path: str) -> dict | None:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
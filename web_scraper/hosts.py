@@ -0,0 +1,125 @@
+import json, os, threading, time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+BACKOFF_START = 1.0  # seconds; first back-off step for hosts crawled with no delay
+EWMA_ALPHA = 0.3     # weight of the newest latency sample
+
+class _Host:
+    def __init__(self, per_host: int, delay: float):
+        self.slots = threading.BoundedSemaphore(per_host)  # in-flight requests
+        self.next = 0.0      # earliest monotonic time for the next request start
+        self.floor = delay   # never go faster than this (HOST_DELAY or robots Crawl-delay)
+        self.delay = delay   # current spacing between request starts
+        self.latency = None  # EWMA of response time
+
+class HostScheduler:
+    """Per-host politeness shared by every crawl thread.
+
+    Each host gets at most `per_host` requests in flight and request starts are
+    spaced by a per-host delay; `max_connections` caps requests across all hosts.
+    The delay starts at `min_delay` (or the robots.txt Crawl-delay, if larger),
+    follows `latency_factor` x the host's smoothed response time, doubles on
+    429/5xx/errors up to `max_delay`, and honours Retry-After.
+    """
+
+    def __init__(self, per_host: int = 1, min_delay: float = 1.0, max_delay: float = 60.0,
+                 latency_factor: float = 2.0, max_connections: int = 16):
+        self.per_host = per_host
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.latency_factor = latency_factor
+        self._total = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._hosts = {}  # netloc -> _Host
+
+    def _host(self, host: str) -> _Host:
+        with self._lock:
+            h = self._hosts.get(host)
+            if h is None:
+                h = self._hosts[host] = _Host(self.per_host, self.min_delay)
+            return h
+
+    def _wait_turn(self, h: _Host):
+        # reserve the next start time under the lock, sleep outside it
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, h.next)
+            h.next = start + h.delay
+        if start > now:
+            time.sleep(start - now)
+
+    @contextmanager
+    def slot(self, url: str):
+        h = self._host(urlparse(url).netloc)
+        with h.slots:
+            self._wait_turn(h)
+            with self._total:
+                yield
+
+    def set_crawl_delay(self, host: str, seconds: float | None):
+        if not seconds:
+            return
+        h = self._host(host)
+        with self._lock:
+            h.floor = max(self.min_delay, min(float(seconds), self.max_delay))
+            h.delay = max(h.delay, h.floor)
+
+    def observe(self, url: str, status: int | None, latency: float, headers: dict | None = None):
+        """Feed back one response (status None for a network error) to adapt the host's delay."""
+        h = self._host(urlparse(url).netloc)
+        with self._lock:
+            if status is None or status == 429 or status >= 500:
+                h.delay = min(self.max_delay, max(h.delay * 2, BACKOFF_START, h.floor))
+                wait = retry_after((headers or {}).get("Retry-After")) if status in (429, 503) else None
+                if wait:
+                    h.next = max(h.next, time.monotonic() + min(wait, self.max_delay))
+                return
+            h.latency = latency if h.latency is None else (1 - EWMA_ALPHA) * h.latency + EWMA_ALPHA * latency
+            target = max(h.floor, min(self.max_delay, self.latency_factor * h.latency))
+            # recover from a back-off gradually rather than jumping straight back
+            h.delay = max(target, h.delay * 0.75)
+
+    def delay(self, host: str) -> float:
+        return self._host(host).delay
+
+def retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RobotsCache:
+    """robots.txt lines per host, kept in a JSON file and reused for `ttl` seconds."""
+
+    def __init__(self, path: str, ttl: float = 86400):
+        self.path, self.ttl = path, ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+
+    def get(self, host: str) -> list[str] | None:
+        with self._lock:
+            e = self._entries.get(host)
+        if e and time.time() - e["fetched_at"] < self.ttl:
+            return e["lines"]
+        return None
+
+    def put(self, host: str, lines: list[str]):
+        with self._lock:
+            self._entries[host] = {"fetched_at": time.time(), "lines": lines}
+            if not self.path:
+                return
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp, self.path)
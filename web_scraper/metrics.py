@@ -0,0 +1,152 @@
+import json, threading, time
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PREFIX = "scraper_"
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, b in enumerate(self.buckets):
+            if value <= b:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """Thread-safe histograms and counters keyed by name + labels, exported as
+    Prometheus text or JSON."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hists = {}     # (name, labels) -> Histogram
+        self._counters = {}  # (name, labels) -> float
+
+    def observe(self, name: str, value: float, buckets: tuple = TIME_BUCKETS, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            h = self._hists.get(key)
+            if h is None:
+                h = self._hists[key] = Histogram(buckets)
+            h.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def to_prometheus(self) -> str:
+        lines, typed = [], set()
+        with self._lock:
+            for (name, labels), h in sorted(self._hists.items()):
+                full = PREFIX + name
+                if full not in typed:
+                    lines.append(f"# TYPE {full} histogram")
+                    typed.add(full)
+                cum = 0
+                for b, c in zip((*h.buckets, "+Inf"), h.counts):
+                    cum += c
+                    lines.append(f"{full}_bucket{_labels(labels, le=b)} {cum}")
+                lines.append(f"{full}_sum{_labels(labels)} {h.sum}")
+                lines.append(f"{full}_count{_labels(labels)} {h.count}")
+            for (name, labels), v in sorted(self._counters.items()):
+                full = PREFIX + name
+                if full not in typed:
+                    lines.append(f"# TYPE {full} counter")
+                    typed.add(full)
+                lines.append(f"{full}{_labels(labels)} {v}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> dict:
+        with self._lock:
+            return {
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "buckets": list(h.buckets),
+                     "counts": h.counts, "sum": h.sum, "count": h.count}
+                    for (name, labels), h in sorted(self._hists.items())
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": v}
+                    for (name, labels), v in sorted(self._counters.items())
+                ],
+            }
+
+    def write(self, path: str):
+        """JSON if the path ends in .json, Prometheus text otherwise."""
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                json.dump(self.to_json(), f, indent=2)
+            else:
+                f.write(self.to_prometheus())
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Expose GET /metrics (Prometheus text) and /metrics.json on a daemon thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, ctype = registry.to_prometheus().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, ctype = json.dumps(registry.to_json()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _labels(labels: tuple, **extra) -> str:
+    items = [*labels, *extra.items()]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+@contextmanager
+def stage(timings: dict | None, name: str):
+    """Add the block's duration to timings[name]; a no-op when timings is None.
+    Lets worker processes hand their timings back with the result."""
+    if timings is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - t0
+
+metrics = Metrics()  # process-wide registry
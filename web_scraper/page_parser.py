@@ -0,0 +1,109 @@
+from lxml import etree
+
+TEXT_SAMPLE_CHARS = 800
+MAX_LINKS = 20                                    # a[href] kept per page for the frontier
+SKIP_TEXT = {"script", "style", "template"}       # same strings BeautifulSoup.get_text leaves out
+FORM_FIELDS = {"input", "textarea", "select"}
+
+class _PageVisitor:
+    """lxml parser target: collects everything extract_signals and the crawler need
+    while the document is parsed, without building a tree."""
+
+    def __init__(self):
+        self.title = None
+        self._in_title = False
+        self._title_parts = []
+        self._skip = 0
+        self._text = []
+        self._text_len = 0
+        self.scripts = []
+        self.imgs_without_alt = 0
+        self.blank_without_noopener = 0
+        self.forms = []
+        self._open_forms = []
+        self.hrefs = []
+
+    def _boundary(self):
+        # get_text(" ") puts the separator between strings, i.e. at tags, never inside a text run
+        if self._text and self._text[-1] != " ":
+            self._text.append(" ")
+
+    def start(self, tag, attrib):
+        if not isinstance(tag, str):
+            return
+        self._boundary()
+        if tag in SKIP_TEXT:
+            self._skip += 1
+            if tag == "script" and attrib.get("src"):
+                self.scripts.append(attrib["src"])
+        elif tag == "title" and self.title is None:
+            self._in_title = True
+        elif tag == "img":
+            if not attrib.get("alt"):
+                self.imgs_without_alt += 1
+        elif tag == "a":
+            if "href" in attrib and len(self.hrefs) < MAX_LINKS:
+                self.hrefs.append(attrib["href"])
+            if attrib.get("target") == "_blank":
+                rel = (attrib.get("rel") or "").split()
+                if "noopener" not in rel and "noreferrer" not in rel:
+                    self.blank_without_noopener += 1
+        elif tag == "form":
+            form = {"method": attrib.get("method"), "action": attrib.get("action"), "inputs": []}
+            self.forms.append(form)
+            self._open_forms.append(form)
+        if tag in FORM_FIELDS and self._open_forms:
+            field = {"name": attrib.get("name"), "type": attrib.get("type"), "autocomplete": attrib.get("autocomplete")}
+            for form in self._open_forms:
+                form["inputs"].append(field)
+
+    def end(self, tag):
+        if not isinstance(tag, str):
+            return
+        self._boundary()
+        if tag in SKIP_TEXT:
+            self._skip = max(0, self._skip - 1)
+        elif tag == "title" and self._in_title:
+            self._in_title = False
+            self.title = "".join(self._title_parts).strip()
+        elif tag == "form" and self._open_forms:
+            self._open_forms.pop()
+
+    def comment(self, text):
+        self._boundary()  # get_text leaves the comment out but still separates the strings around it
+
+    def data(self, data):
+        if self._in_title:
+            self._title_parts.append(data)
+        if self._skip or self._text_len > TEXT_SAMPLE_CHARS:
+            return
+        self._text.append(data)  # lxml splits a run at entity references; the pieces join with ""
+        self._text_len += sum(len(w) + 1 for w in data.split())
+
+    def close(self):
+        if self._in_title:
+            self.title = "".join(self._title_parts).strip()
+        return {
+            "title": self.title or "",
+            "text_sample": " ".join("".join(self._text).split())[:TEXT_SAMPLE_CHARS],
+            "scripts": self.scripts,
+            "imgs_without_alt": self.imgs_without_alt,
+            "blank_without_noopener": self.blank_without_noopener,
+            "forms": self.forms,
+            "hrefs": self.hrefs,
+        }
+
+def parse_page(html: str) -> dict:
+    """Parse once with lxml and return title, text sample, script srcs, img/anchor
+    counts, form fields and the first MAX_LINKS hrefs."""
+    visitor = _PageVisitor()
+    parser = etree.HTMLParser(target=visitor, recover=True)
+    if html.strip():
+        try:
+            parser.feed(html)
+        except etree.LxmlError:
+            pass
+    try:
+        return parser.close()
+    except etree.LxmlError:
+        return visitor.close()
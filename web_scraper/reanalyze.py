@@ -0,0 +1,68 @@
+"""Rebuild clean rows from the raw rows and archived bodies, without refetching.
+
+Usage: ARCHIVE_DIR=archive python reanalyze.py [site ...] [--workers N]
+
+Uses the same SINK_* settings as scraper.py to read raw/<site>/... and rewrite
+clean/<site>/...; bodies come from the BlobStore the crawl filled via ARCHIVE_DIR.
+"""
+import argparse, itertools, multiprocessing, os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+
+import scraper
+from sinks import iter_rows
+from sites import SITES
+
+BATCH = 256  # raw rows handed to the pool at a time
+
+def analyze_raw(row: dict) -> dict | None:
+    body = scraper.archive.get(row["sha256"])
+    if body is None:
+        return None
+    rec = {**row, "html": body.decode("utf-8", errors="ignore")}
+    return {**row, **scraper.extract_signals(rec)}
+
+def open_raw(name: str):
+    key = scraper.sink_key("raw", name)
+    if scraper.SINK_BACKEND == "local":
+        return open(os.path.join(scraper.SINK_DIR, key), "rb")
+    return scraper.s3.get_object(Bucket=scraper.BUCKET, Key=key)["Body"]
+
+def missing_bodies(name: str) -> int:
+    with closing(open_raw(name)) as raw:
+        return sum(1 for row in iter_rows(raw, scraper.SINK_GZIP) if not scraper.archive.path(row["sha256"]))
+
+def reanalyze_site(name: str, pool: ProcessPoolExecutor) -> int:
+    clean_out = scraper.open_sink(scraper.sink_key("clean", name))
+    try:
+        with closing(open_raw(name)) as raw:
+            rows = iter_rows(raw, scraper.SINK_GZIP)
+            while batch := list(itertools.islice(rows, BATCH)):
+                for clean in pool.map(analyze_raw, batch, chunksize=16):
+                    clean_out.write(clean)
+    except BaseException:
+        clean_out.abort()  # the clean output of the crawl stays as it was
+        raise
+    clean_out.close()
+    return clean_out.count
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("sites", nargs="*", help="site names from sites.py (default: all)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    args = ap.parse_args()
+    assert scraper.archive, "Set ARCHIVE_DIR to the archive the crawl wrote"
+
+    names = args.sites or [s["name"] for s in SITES]
+    with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for name in names:
+            # rewriting with bodies missing would drop rows from the clean output
+            missing = missing_bodies(name)
+            if missing:
+                scraper.log.warning(f"[{name}] {missing} raw rows have no archived body; skipping")
+                continue
+            n = reanalyze_site(name, pool)
+            scraper.log.info(f"[{name}] rewrote {n} clean rows → {scraper.sink_key('clean', name)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,55 @@
-import os, time, json, hashlib, logging, re
+import os, time, hashlib, logging, re
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timezone
+from http.cookiejar import DefaultCookiePolicy
 from urllib.parse import urljoin, urlparse
 import urllib.robotparser as rp
 
 import boto3
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
-print("[DEBUG] DASH_BUCKET (env):", repr(os.getenv("DASH_BUCKET")))
 from sites import SITES
+from page_parser import parse_page
+from hosts import HostScheduler, RobotsCache
+from urls import canonical_url
+from crawl_state import CrawlState, conditional_headers
+from sinks import LocalSink, S3MultipartSink
+from frontier import Frontier, save_checkpoint, load_checkpoint
+from archive import BlobStore
+from metrics import metrics, stage, SIZE_BUCKETS
 
 UA = "Masters-DashboardBot/0.1 (+contact: shyamala002@gannon.edu)"
 TIMEOUT = 15
-SLEEP = 1.0
 PAGES_PER_SITE = 250
+SITE_CONCURRENCY = int(os.getenv("SITE_CONCURRENCY", "1"))  # sites crawled in parallel
+HOST_CONCURRENCY = int(os.getenv("HOST_CONCURRENCY", "1"))  # requests in flight per host
+HOST_DELAY = float(os.getenv("HOST_DELAY", "1.0"))          # min seconds between request starts per host
+HOST_MAX_DELAY = float(os.getenv("HOST_MAX_DELAY", "60"))   # back-off ceiling for slow/failing hosts
+LATENCY_FACTOR = float(os.getenv("LATENCY_FACTOR", "2.0"))  # per-host delay follows this x response time
+ROBOTS_CACHE_PATH = os.getenv("ROBOTS_CACHE_PATH", "robots_cache.json")  # "" keeps robots.txt in memory only
+ROBOTS_TTL = float(os.getenv("ROBOTS_TTL", "86400"))        # seconds before robots.txt is refetched
+MAX_CONNECTIONS = int(os.getenv("MAX_CONNECTIONS", "16"))   # cap on requests in flight overall
+ANALYZE_WORKERS = int(os.getenv("ANALYZE_WORKERS", "0"))    # >0: analyze pages in a process pool
+ANALYZE_QUEUE = int(os.getenv("ANALYZE_QUEUE", str(max(2 * ANALYZE_WORKERS, 1))))  # pages waiting per site
 REGION = os.getenv("AWS_DEFAULT_REGION", "us-east-1")
 BUCKET = os.getenv("DASH_BUCKET")
 OVERWRITE_PREFIX = os.getenv("OVERWRITE_PREFIX", "latest")  # or "" to put at root
 CLEAN_OLD_PREFIXES = os.getenv("CLEAN_OLD_PREFIXES", "0") == "1"
+SINK_BACKEND = os.getenv("SINK_BACKEND", "s3")           # "s3" or "local"
+SINK_DIR = os.getenv("SINK_DIR", "out")                   # root for the local backend
+SINK_GZIP = os.getenv("SINK_GZIP", "1") == "1"            # gzip rows, keys get a .gz suffix
+SINK_PART_MB = int(os.getenv("SINK_PART_MB", "8"))        # S3 multipart part size (min 5)
+FRONTIER_BLOOM = int(os.getenv("FRONTIER_BLOOM", "0"))    # >0: Bloom seen-set sized for this many URLs
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "checkpoints") # "" disables resumable crawls
+CHECKPOINT_EVERY = int(os.getenv("CHECKPOINT_EVERY", "25")) # pages between checkpoints
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "")                # set to keep compressed raw bodies for reanalyze.py
+CRAWL_STATE_PATH = os.getenv("CRAWL_STATE_PATH", "crawl_state.db")  # "" disables incremental recrawls
+METRICS_PATH = os.getenv("METRICS_PATH", "")              # write metrics here at the end (.json or Prometheus text)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))        # >0: serve /metrics on localhost during the run
 
 QUEUE_API_ENDPOINTS = os.getenv("QUEUE_API_ENDPOINTS", "1") == "1"  # enable API discovery
 MAX_API_DISCOVER = int(os.getenv("MAX_API_DISCOVER", "10"))         # API links/page cap
@@ -25,29 +57,92 @@ HSTS_MIN_SECONDS = 15552000  # 180 days
 
 log = logging.getLogger("scraper")
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
-s3 = boto3.client("s3", region_name=REGION)
+s3 = boto3.client("s3", region_name=REGION, endpoint_url=os.getenv("S3_ENDPOINT_URL") or None)
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        with metrics.timer("connect_seconds", host=self.host):
+            super().connect()
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):  # TCP + TLS handshake
+        with metrics.timer("connect_seconds", host=self.host):
+            super().connect()
+
+class _TimedHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+class _TimedHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+class TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections report their connect time."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPPool, "https": _TimedHTTPSPool}
+
+# one pooled session for every crawl thread; cookies are not kept between requests
+session = requests.Session()
+session.headers["User-Agent"] = UA
+session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+_adapter = TimedAdapter(pool_connections=MAX_CONNECTIONS, pool_maxsize=MAX_CONNECTIONS)
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
+scheduler = HostScheduler(per_host=HOST_CONCURRENCY, min_delay=HOST_DELAY, max_delay=HOST_MAX_DELAY,
+                          latency_factor=LATENCY_FACTOR, max_connections=MAX_CONNECTIONS)
+robots_cache = RobotsCache(ROBOTS_CACHE_PATH, ttl=ROBOTS_TTL)
+archive = BlobStore(ARCHIVE_DIR) if ARCHIVE_DIR else None
 
 def get_robots(base_url: str) -> rp.RobotFileParser:
-    robots_url = urljoin(base_url, "/robots.txt")
+    host = urlparse(base_url).netloc
+    lines = robots_cache.get(host)
+    if lines is None:
+        robots_url = urljoin(base_url, "/robots.txt")
+        try:
+            with scheduler.slot(robots_url):
+                r = session.get(robots_url, timeout=TIMEOUT)
+            if r.status_code == 200:
+                lines = r.text.splitlines()
+            else:
+                lines = ["User-agent: *", "Allow: /"]
+                # if robots not present/blocked, default to cautious allow of the seeds only
+            robots_cache.put(host, lines)
+        except Exception:
+            lines = ["User-agent: *", "Allow: /"]  # not cached: retry on the next crawl
     p = rp.RobotFileParser()
-    try:
-        r = requests.get(robots_url, headers={"User-Agent": UA}, timeout=TIMEOUT)
-        if r.status_code == 200:
-            p.parse(r.text.splitlines())
-        else:
-            p.parse(["User-agent: *", "Allow: /"])
-            # if robots not present/blocked, default to cautious allow of the seeds only
-
-    except Exception:
-        p.parse(["User-agent: *", "Allow: /"])
+    p.parse(lines)
+    rate = p.request_rate(UA)
+    scheduler.set_crawl_delay(host, p.crawl_delay(UA) or (rate and rate.seconds / rate.requests))
     return p
 
 def same_host(base: str, url: str) -> bool:
     return urlparse(base).netloc == urlparse(url).netloc
 
-def fetch(url: str) -> dict:
-    r = requests.get(url, headers={"User-Agent": UA}, timeout=TIMEOUT, allow_redirects=True)
-    html = r.content
+RAW_FIELDS = ("url","final_url","redirect_chain","timestamp","http_status","headers","sha256")
+
+def fetch(url: str, headers: dict | None = None, site: str = "") -> dict:
+    host = urlparse(url).netloc
+    with scheduler.slot(url):
+        t0 = time.monotonic()
+        try:
+            # stream so the headers (TTFB) and the body download are timed separately
+            r = session.get(url, headers=headers, timeout=TIMEOUT, allow_redirects=True, stream=True)
+        except Exception:
+            scheduler.observe(url, None, time.monotonic() - t0)
+            metrics.inc("fetch_errors_total", site=site, host=host)
+            raise
+        ttfb = time.monotonic() - t0
+        scheduler.observe(url, r.status_code, ttfb, r.headers)
+        html = r.content
+        download = time.monotonic() - t0 - ttfb
+    metrics.observe("ttfb_seconds", ttfb, site=site, host=host)
+    metrics.observe("download_seconds", download, site=site, host=host)
+    metrics.observe("response_bytes", len(html), buckets=SIZE_BUCKETS, site=site, host=host)
+    metrics.inc("responses_total", site=site, host=host, status=r.status_code)
+    sha256 = hashlib.sha256(html).hexdigest()
+    if archive and r.status_code != 304:
+        archive.put(sha256, html)
     chain = [{"status": h.status_code, "url": h.url} for h in r.history]
     final_url = r.url
     return {
@@ -57,7 +152,7 @@ def fetch(url: str) -> dict:
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "http_status": r.status_code,
         "headers": dict(r.headers),
-        "sha256": hashlib.sha256(html).hexdigest(),
+        "sha256": sha256,
         "html": html.decode("utf-8", errors="ignore"),
     }
 
@@ -186,21 +281,22 @@ def find_lib_versions(scripts: list[str]) -> list[str]:
         flags.append("Library: jQuery 1.x (EOL)")
     return found, flags
 
-def analyze_forms(soup, base_url: str) -> tuple[list[dict], list[str]]:
+def analyze_forms(form_specs: list[dict], base_url: str) -> tuple[list[dict], list[str]]:
+    """form_specs come from parse_page: method/action attrs plus name/type/autocomplete per field."""
     flags, forms = [], []
-    for f in soup.find_all("form"):
-        method = (f.get("method","get") or "get").lower()
-        action = f.get("action","") or ""
+    for f in form_specs:
+        method = (f.get("method") or "get").lower()
+        action = f.get("action") or ""
         action_abs = urljoin(base_url, action) if action else base_url
         action_parsed = urlparse(action_abs)
-        inputs = f.find_all(["input","textarea","select"])
-        names = {i.get("name","").lower() for i in inputs if i.get("name")}
+        inputs = f["inputs"]
+        names = {(i.get("name") or "").lower() for i in inputs if i.get("name")}
         has_csrf = any(n in names for n in ("csrf","xsrf","token","authenticity_token","_csrf","_token"))
-        has_password = any((i.get("type","").lower() == "password") for i in inputs)
+        has_password = any(((i.get("type") or "").lower() == "password") for i in inputs)
         autocomplete_flags = []
         for i in inputs:
-            if i.get("type","").lower() in ("password","email","text"):
-                ac = (i.get("autocomplete","") or "").lower()
+            if (i.get("type") or "").lower() in ("password","email","text"):
+                ac = (i.get("autocomplete") or "").lower()
                 if has_password and ac and ac not in ("off","new-password","current-password"):
                     autocomplete_flags.append(f"autocomplete={ac}")
         local = []
@@ -236,15 +332,17 @@ def discover_api_endpoints(html: str, base: str, same_host_only: bool=True, cap:
             break
     return list(urls)
 
-def extract_signals(record: dict) -> dict:
-    """Non-intrusive hints only: headers, mixed content, basic lib hints, a11y counts."""
+def extract_signals(record: dict, page: dict | None = None, timings: dict | None = None) -> dict:
+    """Non-intrusive hints only: headers, mixed content, basic lib hints, a11y counts.
+    Pass a `timings` dict to get seconds spent per analyzer added to it."""
 
-    soup = BeautifulSoup(record["html"], "html.parser")
+    if page is None:
+        with stage(timings, "parse"):
+            page = parse_page(record["html"])
     # title + short text sample
+    title = page["title"]
+    text_sample = page["text_sample"]
 
-    title = (soup.title.string.strip() if soup.title and soup.title.string else "")
-    text_sample = " ".join(soup.get_text(" ").split())[:800]
-    
     # headers present?
     hdrs = {k.lower(): v for k, v in record["headers"].items()}
     sec_presence = {
@@ -259,25 +357,31 @@ def extract_signals(record: dict) -> dict:
         "corp": "cross-origin-resource-policy" in hdrs,
     }
 
-    hsts_info = parse_hsts(hdrs.get("strict-transport-security",""))
-    hsts_flags = analyze_hsts(hsts_info) if hsts_info["present"] else ["HSTS missing"]
+    with stage(timings, "hsts"):
+        hsts_info = parse_hsts(hdrs.get("strict-transport-security",""))
+        hsts_flags = analyze_hsts(hsts_info) if hsts_info["present"] else ["HSTS missing"]
 
-    csp_map = parse_csp(hdrs.get("content-security-policy",""))
-    csp_flags = analyze_csp(csp_map)
+    with stage(timings, "csp"):
+        csp_map = parse_csp(hdrs.get("content-security-policy",""))
+        csp_flags = analyze_csp(csp_map)
 
-    cors_info, cors_flags = analyze_cors(hdrs)
+    with stage(timings, "cors"):
+        cors_info, cors_flags = analyze_cors(hdrs)
 
-    cookies = parse_set_cookie(record["headers"])
-    cookie_flags = analyze_cookies(cookies)
+    with stage(timings, "cookies"):
+        cookies = parse_set_cookie(record["headers"])
+        cookie_flags = analyze_cookies(cookies)
 
-    mixed = record.get("final_url","").startswith("https://") and ("http://" in record["html"])
+    with stage(timings, "mixed_content"):
+        mixed = record.get("final_url","").startswith("https://") and ("http://" in record["html"])
 
-    scripts = [s.get("src", "") for s in soup.find_all("script") if s.get("src")]
-    libs, lib_flags = find_lib_versions(scripts)
+    with stage(timings, "libraries"):
+        libs, lib_flags = find_lib_versions(page["scripts"])
 
-    no_alt = sum(1 for i in soup.find_all("img") if not i.get("alt"))
+    no_alt = page["imgs_without_alt"]
 
-    forms, form_flags = analyze_forms(soup, record.get("final_url") or record["url"])
+    with stage(timings, "forms"):
+        forms, form_flags = analyze_forms(page["forms"], record.get("final_url") or record["url"])
 
     flags_extra = []
     rp = (hdrs.get("referrer-policy","") or "").lower()
@@ -286,10 +390,8 @@ def extract_signals(record: dict) -> dict:
     cc = (hdrs.get("cache-control","") or "").lower()
     if any(w in (record.get("final_url") or record["url"]).lower() for w in ("login","account","settings")) and "no-store" not in cc:
         flags_extra.append("Sensitive page without Cache-Control: no-store")
-    for a in soup.find_all("a", target="_blank"):
-        rel = a.get("rel") or []
-        if "noopener" not in rel and "noreferrer" not in rel:
-            flags_extra.append("External link with target=_blank missing rel=noopener")
+    if page["blank_without_noopener"]:
+        flags_extra.append("External link with target=_blank missing rel=noopener")
 
     header_suggestions = []
     if not sec_presence["permissions-policy"]:
@@ -330,73 +432,210 @@ def extract_signals(record: dict) -> dict:
         "risk_flags": sorted(set(risk_flags)),
     }
 
-def write_jsonl_s3(key: str, rows: list[dict]):
-    body = "\n".join(json.dumps(r, ensure_ascii=False) for r in rows).encode("utf-8")
-    s3.put_object(Bucket=BUCKET, Key=key, Body=body, ContentType="application/json")
-
-def crawl_site(site_name: str, category: str, seeds: list[str]) -> tuple[list[dict], list[dict]]:
+def sink_key(kind: str, name: str) -> str:
+    sub = f"/{OVERWRITE_PREFIX}" if OVERWRITE_PREFIX else ""
+    return f"{kind}/{name}{sub}/items.jsonl" + (".gz" if SINK_GZIP else "")
+
+def remove_other_format(key: str):
+    """Delete the key's .jsonl / .jsonl.gz twin left by a run with the other SINK_GZIP,
+    so readers of the prefix do not see last run's rows next to this run's."""
+    other = key[:-len(".gz")] if key.endswith(".gz") else key + ".gz"
+    if SINK_BACKEND == "local":
+        if os.path.exists(os.path.join(SINK_DIR, other)):
+            os.remove(os.path.join(SINK_DIR, other))
+    else:
+        s3.delete_object(Bucket=BUCKET, Key=other)  # no error if it is not there
+
+def open_sink(key: str, resume: dict | None = None):
+    if SINK_BACKEND == "local":
+        return LocalSink(SINK_DIR, key, compress=SINK_GZIP, resume=resume)
+    return S3MultipartSink(s3, BUCKET, key, part_size=SINK_PART_MB * 1024 * 1024, compress=SINK_GZIP,
+                           resume=resume)
+
+def discover_links(rec: dict, base: str, hrefs: list[str]) -> list[tuple[str, str]]:
+    """Same-host links to queue, as (url, source) with source "link" or "api"."""
+    links = []
+    for href in hrefs:
+        if href.startswith("/"):
+            href = urljoin(base, href)
+        if href.startswith("http") and same_host(base, href):
+            links.append((href, "link"))
+
+    if QUEUE_API_ENDPOINTS:
+        for api_url in discover_api_endpoints(rec["html"], base, same_host_only=True, cap=MAX_API_DISCOVER):
+            if same_host(base, api_url):
+                links.append((api_url, "api"))
+    return links
+
+def analyze_page(rec: dict, base: str) -> tuple[dict, list[tuple[str, str]], dict]:
+    """One parse of the page feeds both the clean-row signals and the frontier links.
+    Also returns seconds per stage, so timings survive a trip through the analyzer pool."""
+    timings = {}
+    with stage(timings, "parse"):
+        page = parse_page(rec["html"])
+    sig = extract_signals(rec, page, timings)
+    with stage(timings, "links"):
+        links = discover_links(rec, base, page["hrefs"])
+    return sig, links, timings
+
+def crawl_site(site_name: str, category: str, seeds: list[str], raw_out, clean_out,
+               state: CrawlState | None = None, checkpoint_path: str = "", resume: dict | None = None,
+               analyzer: ProcessPoolExecutor | None = None) -> int:
+    """Crawl one site, writing each raw/clean row to its sink as soon as it is produced.
+
+    With an `analyzer` pool, fetched pages are parsed and analyzed in worker processes
+    while the fetch threads keep going; at most ANALYZE_QUEUE pages wait on it.
+
+    With checkpoint_path set, the frontier, in-flight URLs and sink positions are saved
+    every CHECKPOINT_EVERY pages; `resume` is a loaded checkpoint to continue from.
+    Returns the number of pages written.
+    """
     base = seeds[0]
     robots = get_robots(base)
-    seen, queue = set(), list(seeds)
-    raw_rows, clean_rows = [], []
-
-    while queue and len(raw_rows) < PAGES_PER_SITE:
-        url = queue.pop(0)
-        if url in seen:
-            continue
-        seen.add(url)
-        if not robots.can_fetch(UA, url):
-            log.info(f"[{site_name}] blocked by robots.txt: {url}")
-            continue
-
-        try:
-            rec = fetch(url)
-        except Exception as e:
-            log.warning(f"[{site_name}] fetch failed: {url} ({e})")
-            continue
-
-        raw_row = {
-            "site": site_name, "category": category,
-            **{k: rec[k] for k in ("url","final_url","redirect_chain","timestamp","http_status","headers","sha256")}
-        }
-        raw_rows.append(raw_row)
-
-        sig = extract_signals(rec)
-        clean_rows.append({**raw_row, **sig})
-
-        soup = BeautifulSoup(rec["html"], "html.parser")
-        for a in soup.select("a[href]")[:20]:
-            href = a["href"]
-            if href.startswith("/"):
-                href = urljoin(base, href)
-            if href.startswith("http") and same_host(base, href):
-                queue.append(href)
-
-        if QUEUE_API_ENDPOINTS:
-            for api_url in discover_api_endpoints(rec["html"], base, same_host_only=True, cap=MAX_API_DISCOVER):
-                if same_host(base, api_url):
-                    queue.append(api_url)
-
-        time.sleep(SLEEP)
-
-    return raw_rows, clean_rows
+    if resume:
+        frontier, crawled = Frontier.from_dict(resume["frontier"]), resume["crawled"]
+        for url, depth in resume["inflight"]:
+            frontier.requeue(url, depth)
+        log.info(f"[{site_name}] resuming after {crawled} pages, {len(frontier)} queued")
+    else:
+        frontier, crawled = Frontier(bloom_capacity=FRONTIER_BLOOM), 0
+        for url in seeds:
+            frontier.push(url, 0)
+    last_checkpoint = crawled
+    pending = {}    # fetch future -> (url, depth, state entry from the previous crawl)
+    analyzing = {}  # analyzer future -> (url, depth, rec, raw_row)
+
+    def emit(url, depth, rec, raw_row, clean_row, links, timings=None):
+        nonlocal crawled
+        for name, secs in (timings or {}).items():
+            metrics.observe("analyze_seconds", secs, site=site_name, stage=name)
+        if state and rec["http_status"] == 200:
+            state.put(canonical_url(url), rec["headers"], rec["sha256"], clean_row, links)
+        with metrics.timer("sink_write_seconds", site=site_name):
+            raw_out.write(raw_row)
+            clean_out.write(clean_row)
+        metrics.inc("pages_total", site=site_name, source="reused" if timings is None else "analyzed")
+        crawled += 1
+        for link, source in links:
+            frontier.push(link, depth + 1, source)
+
+    with ThreadPoolExecutor(max_workers=HOST_CONCURRENCY) as pool:
+        while frontier or pending or analyzing:
+            # keep up to HOST_CONCURRENCY fetches in flight, never more than the page budget;
+            # stop fetching while the analyzers are ANALYZE_QUEUE pages behind
+            while (frontier and len(pending) < HOST_CONCURRENCY and len(analyzing) < ANALYZE_QUEUE
+                   and crawled + len(pending) + len(analyzing) < PAGES_PER_SITE):
+                url, depth = frontier.pop()
+                if not robots.can_fetch(UA, url):
+                    log.info(f"[{site_name}] blocked by robots.txt: {url}")
+                    continue
+                prev = state.get(canonical_url(url)) if state else None
+                cond = conditional_headers(prev)
+                if archive and prev and not archive.path(prev["sha256"]):
+                    cond = {}  # a 304 has no body to archive: fetch in full once so reanalyze has it
+                pending[pool.submit(fetch, url, cond, site_name)] = (url, depth, prev)
+            if not pending and not analyzing:
+                break
+
+            done, _ = wait([*pending, *analyzing], return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut in analyzing:
+                    url, depth, rec, raw_row = analyzing.pop(fut)
+                    sig, links, timings = fut.result()
+                    emit(url, depth, rec, raw_row, {**raw_row, **sig}, links, timings)
+                    continue
+
+                url, depth, prev = pending.pop(fut)
+                try:
+                    rec = fut.result()
+                except Exception as e:
+                    log.warning(f"[{site_name}] fetch failed: {url} ({e})")
+                    continue
+
+                if prev and (rec["http_status"] == 304 or rec["sha256"] == prev["sha256"]):
+                    # unchanged since the last crawl: reuse the stored row instead of re-parsing
+                    clean_row = {**prev["clean_row"], "site": site_name, "category": category,
+                                 "timestamp": rec["timestamp"]}
+                    # the raw log records this response (a 304 and its headers); only the body is the old one
+                    raw_row = {"site": site_name, "category": category, **{k: rec[k] for k in RAW_FIELDS},
+                               "sha256": prev["sha256"]}
+                    emit(url, depth, rec, raw_row, clean_row, prev["links"])
+                    continue
+
+                raw_row = {"site": site_name, "category": category, **{k: rec[k] for k in RAW_FIELDS}}
+                if analyzer:
+                    analyzing[analyzer.submit(analyze_page, rec, base)] = (url, depth, rec, raw_row)
+                else:
+                    sig, links, timings = analyze_page(rec, base)
+                    emit(url, depth, rec, raw_row, {**raw_row, **sig}, links, timings)
+
+            if checkpoint_path and crawled - last_checkpoint >= CHECKPOINT_EVERY:
+                save_checkpoint(checkpoint_path, {
+                    "crawled": crawled,
+                    "frontier": frontier.to_dict(),
+                    "inflight": [[v[0], v[1]] for v in (*pending.values(), *analyzing.values())],
+                    "raw_out": raw_out.checkpoint(checkpoint_path + ".raw"),
+                    "clean_out": clean_out.checkpoint(checkpoint_path + ".clean"),
+                })
+                last_checkpoint = crawled
+
+    return crawled
+
+def crawl_and_upload(s: dict, state: CrawlState | None = None, analyzer: ProcessPoolExecutor | None = None) -> int:
+    name, cat, seeds = s["name"], s["category"], s["seeds"]
+    log.info(f"==> Crawling {name} ({cat})")
+
+    ckpt_path = os.path.join(CHECKPOINT_DIR, f"{name}.json") if CHECKPOINT_DIR else ""
+    ckpt = load_checkpoint(ckpt_path)
+    raw_out = open_sink(sink_key("raw", name), ckpt and ckpt["raw_out"])
+    clean_out = open_sink(sink_key("clean", name), ckpt and ckpt["clean_out"])
+    try:
+        crawl_site(name, cat, seeds, raw_out, clean_out, state, ckpt_path, ckpt, analyzer)
+    except BaseException:
+        if ckpt_path and os.path.exists(ckpt_path):
+            # leave the sinks open so the next run resumes them from the checkpoint
+            log.warning(f"[{name}] crawl interrupted; rerun to resume from {ckpt_path}")
+            raise
+        # no checkpoint: drop the partial output rather than publish it over the last complete run
+        raw_out.abort()
+        clean_out.abort()
+        raise
+    with metrics.timer("sink_close_seconds", site=name):
+        raw_out.close()
+        clean_out.close()
+    for kind in ("raw", "clean"):
+        remove_other_format(sink_key(kind, name))
+    for suffix in ("", ".raw", ".clean"):
+        if ckpt_path and os.path.exists(ckpt_path + suffix):
+            os.remove(ckpt_path + suffix)
+
+    where = SINK_DIR if SINK_BACKEND == "local" else f"s3://{BUCKET}"
+    log.info(f"Wrote {raw_out.count} raw   → {where}/{sink_key('raw', name)}")
+    log.info(f"Wrote {clean_out.count} clean → {where}/{sink_key('clean', name)}")
+    return raw_out.count
 
 def main():
-    assert BUCKET, "Set your bucket: export DASH_BUCKET=<your-bucket-name>"
-
-    for s in SITES:
-        name, cat, seeds = s["name"], s["category"], s["seeds"]
-        log.info(f"==> Crawling {name} ({cat})")
-        raw_rows, clean_rows = crawl_site(name, cat, seeds)
-
-        sub = f"/{OVERWRITE_PREFIX}" if OVERWRITE_PREFIX else ""
-        raw_key   = f"raw/{name}{sub}/items.jsonl"
-        clean_key = f"clean/{name}{sub}/items.jsonl"
-
-        write_jsonl_s3(raw_key, raw_rows)
-        write_jsonl_s3(clean_key, clean_rows)
-        log.info(f"Uploaded {len(raw_rows)} raw  → s3://{BUCKET}/{raw_key}")
-        log.info(f"Uploaded {len(clean_rows)} clean → s3://{BUCKET}/{clean_key}")
+    assert BUCKET or SINK_BACKEND == "local", "Set your bucket: export DASH_BUCKET=<your-bucket-name>"
+
+    state = CrawlState(CRAWL_STATE_PATH) if CRAWL_STATE_PATH else None
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+        log.info(f"metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+    # spawn, not fork: the crawl threads may hold locks when the first worker starts
+    analyzer = (ProcessPoolExecutor(ANALYZE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+                if ANALYZE_WORKERS else None)
+    # sites share the host scheduler, so parallel sites never exceed MAX_CONNECTIONS
+    try:
+        with ThreadPoolExecutor(max_workers=SITE_CONCURRENCY) as pool:
+            list(pool.map(lambda s: crawl_and_upload(s, state, analyzer), SITES))
+    finally:
+        if analyzer:
+            analyzer.shutdown()
+        if state:
+            state.close()
+        if METRICS_PATH:
+            metrics.write(METRICS_PATH)
+            log.info(f"metrics written to {METRICS_PATH}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,143 @@
+import gzip, io, json, os
+
+from metrics import metrics
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for every part but the last
+
+class LocalSink:
+    """Writes JSONL rows to a file under `root` as they arrive, gzip-compressed if asked.
+
+    Rows go to path + ".part", renamed over the previous file by close(); abort()
+    drops it. checkpoint() ends the current gzip member so the file is valid up
+    to that point; passing its result back as `resume` truncates to there and appends.
+    """
+
+    def __init__(self, root: str, key: str, compress: bool = True, resume: dict | None = None):
+        self.path = os.path.join(root, key)
+        self.part = self.path + ".part"
+        self.compress = compress
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if resume:
+            with open(self.part, "r+b") as f:
+                f.truncate(resume["size"])
+        self._f = self._open("a" if resume else "w")
+        self.count = resume["count"] if resume else 0
+
+    def _open(self, mode: str):
+        if self.compress:
+            return gzip.open(self.part, mode + "t", encoding="utf-8")
+        return open(self.part, mode, encoding="utf-8")
+
+    def write(self, row: dict):
+        self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def checkpoint(self, spill_path: str) -> dict:
+        self._f.close()
+        self._f = self._open("a")
+        return {"size": os.path.getsize(self.part), "count": self.count}
+
+    def close(self):
+        self._f.close()
+        os.replace(self.part, self.path)
+
+    def abort(self):
+        self._f.close()
+        os.remove(self.part)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class S3MultipartSink:
+    """Streams JSONL rows to one S3 object with a multipart upload.
+
+    Rows are gzip-compressed into a buffer that is shipped as a part whenever it
+    reaches `part_size`, so memory stays around one part no matter how many rows.
+    checkpoint() records the open upload and spills the unsent buffer to a file;
+    passing its result back as `resume` continues the same upload. abort()
+    discards the upload, so the object under the key stays as it was.
+    """
+
+    def __init__(self, client, bucket: str, key: str, part_size: int = 8 * 1024 * 1024, compress: bool = True,
+                 resume: dict | None = None):
+        self.client, self.bucket, self.key = client, bucket, key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self._buf = io.BytesIO()
+        self._parts = []
+        self._upload_id = None
+        self.count = 0
+        if resume:
+            self._upload_id, self._parts, self.count = resume["upload_id"], resume["parts"], resume["count"]
+            with open(resume["spill"], "rb") as f:
+                self._buf.write(f.read())
+        # GzipFile writes its header on creation, so it must come after any restored bytes
+        self._gz = gzip.GzipFile(fileobj=self._buf, mode="wb") if compress else None
+        self.content_type = "application/gzip" if compress else "application/json"
+
+    def write(self, row: dict):
+        data = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+        (self._gz or self._buf).write(data)
+        self.count += 1
+        if self._buf.tell() >= self.part_size:
+            self._flush_part()
+
+    def _flush_part(self):
+        if self._upload_id is None:
+            self._upload_id = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type,
+            )["UploadId"]
+        n = len(self._parts) + 1
+        body = self._buf.getvalue()
+        with metrics.timer("upload_part_seconds"):
+            r = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                                        PartNumber=n, Body=body)
+        metrics.inc("upload_bytes_total", len(body))
+        self._parts.append({"PartNumber": n, "ETag": r["ETag"]})
+        self._buf.seek(0)
+        self._buf.truncate()
+
+    def checkpoint(self, spill_path: str) -> dict:
+        if self._gz:
+            # end the gzip member so the spilled bytes are complete on their own
+            self._gz.close()
+        with open(spill_path, "wb") as f:
+            f.write(self._buf.getvalue())
+        if self._gz:
+            self._gz = gzip.GzipFile(fileobj=self._buf, mode="wb")
+        return {"upload_id": self._upload_id, "parts": self._parts, "count": self.count, "spill": spill_path}
+
+    def close(self):
+        if self._gz:
+            self._gz.close()
+        if self._upload_id is None:
+            # everything fit in one part: a plain PUT is cheaper than a multipart upload
+            body = self._buf.getvalue()
+            with metrics.timer("upload_part_seconds"):
+                self.client.put_object(Bucket=self.bucket, Key=self.key, Body=body, ContentType=self.content_type)
+            metrics.inc("upload_bytes_total", len(body))
+            return
+        if self._buf.tell():
+            self._flush_part()
+        self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                                              MultipartUpload={"Parts": self._parts})
+
+    def abort(self):
+        if self._upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        self._buf = io.BytesIO()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_rows(fileobj, compress: bool):
+    """Yield rows from a JSONL stream written by one of the sinks above."""
+    f = gzip.GzipFile(fileobj=fileobj) if compress else fileobj
+    for line in f:
+        if line.strip():
+            yield json.loads(line)